@@ -0,0 +1,181 @@
+import math
+import time
+from collections import OrderedDict, defaultdict
+from typing import Annotated
+
+from fastapi import Depends, HTTPException, status
+
+from app.backend.config import (
+    ADMISSION_CART_CONCURRENCY,
+    ADMISSION_CATALOG_RESERVE,
+    ADMISSION_CHECKOUT_CONCURRENCY,
+    ADMISSION_ENABLED,
+    ADMISSION_MAX_USERS,
+    ADMISSION_POOL_WAITING,
+    ADMISSION_RETRY_AFTER,
+    ADMISSION_USER_BURST,
+    ADMISSION_USER_RATE,
+    DB_MAX_OVERFLOW,
+    DB_POOL_SIZE,
+)
+from app.backend.db import engine
+from app.routers.auth import get_current_user
+
+
+class TokenBuckets:
+    """Token bucket на пользователя: rate токенов в секунду, не больше burst.
+
+    Ведра хранятся LRU на maxsize пользователей; вытесненный пользователь
+    начинает с полного ведра.
+    """
+
+    def __init__(self, rate: float, burst: int, maxsize: int):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.maxsize = maxsize
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+
+    def take(self, key: str) -> float:
+        """0, если токен взят, иначе через сколько секунд он появится."""
+        if self.rate <= 0:
+            return 0.0
+        now = time.monotonic()
+        tokens, updated = self._buckets.pop(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / self.rate
+        self._buckets[key] = (tokens, now)
+        if len(self._buckets) > self.maxsize:
+            self._buckets.popitem(last=False)
+        return wait
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class AdmissionController:
+    """Допуск запросов на запись до того, как они займут соединение с БД.
+
+    Отклоняет сразу, а не ставит в очередь: 503, если очередь ожидания пула
+    длиннее pool_waiting или класс маршрутов упёрся в свой лимит
+    одновременных запросов; 503 и при превышении общего лимита записи, чтобы
+    часть пула всегда оставалась чтению каталога; 429, если пользователь
+    исчерпал свой token bucket. Всё с Retry-After. С enabled=False только
+    считает запросы и никого не отклоняет.
+    """
+
+    def __init__(
+        self,
+        buckets: TokenBuckets,
+        limits: dict[str, int],
+        writes_limit: int,
+        pool_waiting: int,
+        retry_after: int,
+        pool_engine=engine,
+        enabled: bool = True,
+    ):
+        self.buckets = buckets
+        self.limits = limits
+        self.writes_limit = writes_limit
+        self.pool_waiting = pool_waiting
+        self.retry_after = retry_after
+        self.pool_engine = pool_engine
+        self.enabled = enabled
+        self.in_flight: dict[str, int] = defaultdict(int)
+        self.admitted: dict[str, int] = defaultdict(int)
+        self.rejections: dict[tuple[str, str], int] = defaultdict(int)
+
+    def _reject(self, route_class: str, reason: str, status_code: int, retry_after: int):
+        self.rejections[(route_class, reason)] += 1
+        raise HTTPException(
+            status_code=status_code,
+            detail="Too many requests, try again later",
+            headers={"Retry-After": str(retry_after)},
+        )
+
+    def admit(self, route_class: str, user_id) -> None:
+        if self.enabled:
+            self._check(route_class, user_id)
+        self.in_flight[route_class] += 1
+        self.admitted[route_class] += 1
+
+    def _check(self, route_class: str, user_id) -> None:
+        unavailable = status.HTTP_503_SERVICE_UNAVAILABLE
+        # Сначала проверки ёмкости: отказ из-за перегрузки не тратит токены пользователя
+        if self.pool_waiting and self.pool_engine.sync_engine.pool.waiting > self.pool_waiting:
+            self._reject(route_class, "pool_waiting", unavailable, self.retry_after)
+        if self.in_flight[route_class] >= self.limits[route_class]:
+            self._reject(route_class, "concurrency", unavailable, self.retry_after)
+        if sum(self.in_flight.values()) >= self.writes_limit:
+            self._reject(route_class, "catalog_reserve", unavailable, self.retry_after)
+        wait = self.buckets.take(str(user_id))
+        if wait:
+            self._reject(route_class, "rate_limit", status.HTTP_429_TOO_MANY_REQUESTS, math.ceil(wait))
+
+    def release(self, route_class: str) -> None:
+        self.in_flight[route_class] -= 1
+
+    def dependency(self, route_class: str):
+        """Зависимость маршрута: держит место в классе до конца обработчика."""
+
+        async def admit(get_user: Annotated[dict, Depends(get_current_user)]):
+            self.admit(route_class, get_user.get("id"))
+            try:
+                yield
+            finally:
+                self.release(route_class)
+
+        return admit
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "limits": self.limits,
+            "writes_limit": self.writes_limit,
+            "in_flight": dict(self.in_flight),
+            "admitted": dict(self.admitted),
+            "rejections": {
+                f"{route_class}:{reason}": count
+                for (route_class, reason), count in self.rejections.items()
+            },
+            "tracked_users": len(self.buckets),
+        }
+
+    def render(self) -> list[str]:
+        """Строки для /metrics (Metrics.collectors)."""
+        lines = [
+            "# HELP admission_rejections_total Requests rejected by admission control.",
+            "# TYPE admission_rejections_total counter",
+        ]
+        for (route_class, reason), count in self.rejections.items():
+            lines.append(
+                f'admission_rejections_total{{route_class="{route_class}",reason="{reason}"}} {count}'
+            )
+        lines += [
+            "# HELP admission_in_flight Admitted requests being processed.",
+            "# TYPE admission_in_flight gauge",
+        ]
+        for route_class in self.limits:
+            lines.append(f'admission_in_flight{{route_class="{route_class}"}} {self.in_flight[route_class]}')
+        return lines
+
+
+# Запись получает не больше (1 - ADMISSION_CATALOG_RESERVE) соединений
+# основного пула; остальное остаётся каталогу
+_writes_limit = max(1, int((DB_POOL_SIZE + DB_MAX_OVERFLOW) * (1 - ADMISSION_CATALOG_RESERVE)))
+
+admission = AdmissionController(
+    TokenBuckets(ADMISSION_USER_RATE, ADMISSION_USER_BURST, ADMISSION_MAX_USERS),
+    limits={
+        "cart": ADMISSION_CART_CONCURRENCY or _writes_limit,
+        # Оформление держит транзакцию дольше всех, поэтому по умолчанию ему половина
+        "checkout": ADMISSION_CHECKOUT_CONCURRENCY or max(1, _writes_limit // 2),
+    },
+    writes_limit=_writes_limit,
+    pool_waiting=ADMISSION_POOL_WAITING,
+    retry_after=ADMISSION_RETRY_AFTER,
+    enabled=ADMISSION_ENABLED,
+)
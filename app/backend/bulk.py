@@ -0,0 +1,166 @@
+import codecs
+import csv
+import io
+import json
+from typing import AsyncIterator
+
+from fastapi import HTTPException, UploadFile, status
+
+from app.backend.config import BULK_BATCH_SIZE, UPLOAD_CHUNK_SIZE
+from app.backend.db import read_session_maker
+
+# Сколько ошибок по строкам возвращать в ответе на импорт
+MAX_REPORTED_ERRORS = 1000
+
+# Предел колонок Integer (int4): большее значение asyncpg не отправит
+# и оборвёт весь импорт, поэтому такие строки отсекаются заранее
+MAX_INT4 = 2**31 - 1
+
+
+def id_refs(refs) -> list[int]:
+    """Ссылки из цифр, которые могут быть id, без выходящих за int4."""
+    return [int(ref) for ref in refs if ref.isascii() and ref.isdigit() and int(ref) <= MAX_INT4]
+
+
+def import_format(file: UploadFile) -> str:
+    name = (file.filename or "").lower()
+    if name.endswith(".csv") or file.content_type == "text/csv":
+        return "csv"
+    if name.endswith((".ndjson", ".jsonl")) or file.content_type in (
+        "application/x-ndjson",
+        "application/jsonl",
+    ):
+        return "ndjson"
+    raise HTTPException(
+        status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+        detail="Import file must be CSV or NDJSON",
+    )
+
+
+async def _iter_lines(file: UploadFile) -> AsyncIterator[str]:
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    tail = ""
+    while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+        lines = (tail + decoder.decode(chunk)).split("\n")
+        tail = lines.pop()
+        for line in lines:
+            yield line
+    tail += decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+async def iter_records(file: UploadFile) -> AsyncIterator[tuple[int, dict | None, str | None]]:
+    """Построчно читает CSV (с заголовком) или NDJSON, не загружая файл целиком.
+
+    Отдаёт (номер записи, запись, ошибка разбора).
+    """
+    file_format = import_format(file)
+    header = None
+    row = 0
+    pending = ""
+    async for line in _iter_lines(file):
+        line = line.rstrip("\r")
+        if file_format == "csv":
+            # Поле в кавычках может содержать перевод строки: копим строки,
+            # пока число кавычек не станет чётным
+            pending = f"{pending}\n{line}" if pending else line
+            if pending.count('"') % 2:
+                continue
+            line, pending = pending, ""
+        if not line.strip():
+            continue
+        if file_format == "csv":
+            values = next(csv.reader([line]))
+            if header is None:
+                header = [name.strip() for name in values]
+                continue
+            row += 1
+            if len(values) != len(header):
+                yield row, None, f"Expected {len(header)} columns, got {len(values)}"
+            else:
+                yield row, dict(zip(header, values)), None
+        else:
+            row += 1
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield row, None, f"Invalid JSON: {e}"
+                continue
+            if isinstance(record, dict):
+                yield row, record, None
+            else:
+                yield row, None, "Row must be a JSON object"
+    if pending:
+        yield row + 1, None, "Unterminated quoted field"
+
+
+async def batched(records: AsyncIterator, size: int = BULK_BATCH_SIZE) -> AsyncIterator[list]:
+    batch = []
+    async for record in records:
+        batch.append(record)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def parse_bool(value) -> bool:
+    if isinstance(value, bool):
+        return value
+    value = str(value).strip().lower()
+    if value in ("1", "true", "yes", "on"):
+        return True
+    if value in ("0", "false", "no", "off"):
+        return False
+    raise ValueError(f"Invalid boolean: {value!r}")
+
+
+def dedupe_by_slug(rows: list[dict], errors: list) -> list[dict]:
+    """Оставляет последнюю строку с каждым slug: ON CONFLICT не может
+    изменить одну запись дважды за один INSERT."""
+    latest = {}
+    for row in rows:
+        previous = latest.get(row["slug"])
+        if previous is not None:
+            errors.append({
+                "row": previous["row"],
+                "error": f"Duplicate slug {row['slug']!r}, overridden by row {row['row']}",
+            })
+        latest[row["slug"]] = row
+    return list(latest.values())
+
+
+def _json_default(value):
+    return value.isoformat() if hasattr(value, "isoformat") else str(value)
+
+
+async def stream_ndjson(query, batch_size: int = BULK_BATCH_SIZE) -> AsyncIterator[bytes]:
+    """Построчно отдаёт результат запроса через серверный курсор.
+
+    Сессия открывается внутри генератора: зависимость get_db закрывается
+    раньше, чем StreamingResponse дочитает данные.
+    """
+    async with read_session_maker() as db:
+        result = await db.stream(query.execution_options(yield_per=batch_size))
+        async for partition in result.mappings().partitions():
+            yield "".join(
+                json.dumps(dict(row), ensure_ascii=False, default=_json_default) + "\n"
+                for row in partition
+            ).encode()
+
+
+async def stream_csv(query, batch_size: int = BULK_BATCH_SIZE) -> AsyncIterator[bytes]:
+    async with read_session_maker() as db:
+        result = await db.stream(query.execution_options(yield_per=batch_size))
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(result.keys())
+        async for partition in result.partitions():
+            writer.writerows(partition)
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue().encode()
@@ -0,0 +1,234 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+
+from pydantic import TypeAdapter
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.backend.compression import compress
+from app.backend.config import CATALOG_CACHE_TTL, COMPRESSION_MIN_SIZE
+from app.backend.db import async_session_maker, read_session_maker
+from app.backend.invalidation import publish
+from app.models import CatalogRevision, Category, Product
+from app.schemas import CategoryOut, ProductOut
+
+logger = logging.getLogger(__name__)
+
+PRODUCT_LIST = TypeAdapter(list[ProductOut])
+CATEGORY_LIST = TypeAdapter(list[CategoryOut])
+
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    version: int
+    built_at: float
+    # Ревизия каталога из БД на момент сборки и время её изменения (unix time):
+    # одинаковы во всех воркерах, из них строятся ETag и Last-Modified
+    revision: int
+    last_modified: float
+    # Готовые JSON-ответы полных списков: сериализуются один раз на снимок
+    products_json: bytes
+    categories_json: bytes
+    # (имя тела, кодировка) -> сжатое тело; тоже один раз на снимок
+    compressed: dict[tuple[str, str], bytes]
+
+    @property
+    def etag(self) -> str:
+        # Слабый: сжатое и несжатое тело — одно представление, и ETag у 200
+        # и 304 совпадает независимо от того, сжал ли ответ middleware
+        return f'W/"r{self.revision}"'
+
+    def body(self, name: str, encoding: str | None) -> tuple[bytes, str | None]:
+        """Тело "products"/"categories" в нужной кодировке, если она заготовлена."""
+        compressed = self.compressed.get((name, encoding))
+        if compressed is None:
+            return getattr(self, f"{name}_json"), None
+        return compressed, encoding
+
+
+def _precompress(bodies: dict[str, bytes]) -> dict[tuple[str, str], bytes]:
+    return {
+        (name, encoding): compress(body, encoding, static=True)
+        for name, body in bodies.items()
+        if len(body) >= COMPRESSION_MIN_SIZE
+        for encoding in ("br", "gzip")
+    }
+
+
+def _serialize(products: list, categories: list) -> tuple[bytes, bytes, dict[tuple[str, str], bytes]]:
+    """JSON и сжатые тела снимка. На большом каталоге это сотни миллисекунд,
+    поэтому вызывается в отдельном потоке, а не в цикле событий."""
+    products_json = PRODUCT_LIST.dump_json(PRODUCT_LIST.validate_python([dict(row) for row in products]))
+    categories_json = CATEGORY_LIST.dump_json(CATEGORY_LIST.validate_python([dict(row) for row in categories]))
+    compressed = _precompress({"products": products_json, "categories": categories_json})
+    return products_json, categories_json, compressed
+
+
+class CatalogCache:
+    """Снимок каталога (готовые ответы со списками товаров и категорий) в памяти процесса.
+
+    Любая запись админа увеличивает версию и пересобирает снимок. Новый
+    снимок подменяется одним присваиванием, поэтому читатели не ждут
+    пересборку: до её окончания они получают предыдущий снимок.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self.rebuilds = 0
+        self.invalidations = 0
+        self._snapshot: CatalogSnapshot | None = None
+        self._background: asyncio.Task | None = None
+        self._remote: set[asyncio.Task] = set()
+
+    async def get(self, db: AsyncSession) -> CatalogSnapshot:
+        snapshot = self._snapshot
+        if snapshot is None:
+            self.misses += 1
+            snapshot = await self._build(db, self.version)
+            self._publish(snapshot)
+            return snapshot
+
+        self.hits += 1
+        if snapshot.version != self.version or self._expired(snapshot):
+            self._refresh_in_background()
+        return snapshot
+
+    @staticmethod
+    async def bump(db: AsyncSession) -> None:
+        """Новая ревизия каталога; вызывается в транзакции записи до commit.
+
+        Строка ревизии заблокирована до конца транзакции, поэтому
+        параллельные записи получают номера в порядке фиксации. Уведомление
+        остальным воркерам уходит в той же транзакции и доставляется при commit.
+        Если строки ещё нет (БД создана без миграций), она создаётся с ревизией 1.
+        """
+        stmt = insert(CatalogRevision).values(id=1)
+        revision = await db.scalar(
+            stmt.on_conflict_do_update(
+                index_elements=[CatalogRevision.id],
+                set_={
+                    "revision": CatalogRevision.revision + 1,
+                    "updated_at": func.clock_timestamp(),
+                },
+            )
+            .returning(CatalogRevision.revision)
+        )
+        await publish(db, revision)
+
+    async def refresh(self, db: AsyncSession) -> None:
+        """Вызывается после commit записи в каталог: новая версия и новый снимок.
+
+        Запись уже зафиксирована, поэтому ошибка пересборки не должна дойти
+        до клиента: снимок соберётся заново при следующем чтении.
+        """
+        self.version += 1
+        try:
+            self._publish(await self._build(db, self.version))
+        except Exception:
+            logger.exception("Catalog snapshot rebuild after write failed")
+
+    def invalidate(self, revision: int | None = None) -> None:
+        """Каталог изменён в другом процессе (LISTEN/NOTIFY): пересобрать снимок."""
+        self.invalidations += 1
+        self.version += 1
+        task = asyncio.create_task(self._apply_remote(self.version))
+        self._remote.add(task)
+        task.add_done_callback(self._remote.discard)
+
+    @property
+    def etag(self) -> str | None:
+        # ETag меняется только с публикацией снимка, поэтому клиент не получит
+        # старые данные с новым ETag
+        return self._snapshot.etag if self._snapshot else None
+
+    @property
+    def last_modified(self) -> float:
+        return self._snapshot.last_modified if self._snapshot else 0.0
+
+    def stats(self) -> dict:
+        snapshot = self._snapshot
+        lookups = self.hits + self.misses
+        return {
+            "version": self.version,
+            "revision": snapshot.revision if snapshot else None,
+            "etag": self.etag,
+            "snapshot_version": snapshot.version if snapshot else None,
+            "age": time.monotonic() - snapshot.built_at if snapshot else None,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "rebuilds": self.rebuilds,
+            "invalidations": self.invalidations,
+        }
+
+    def _expired(self, snapshot: CatalogSnapshot) -> bool:
+        return time.monotonic() - snapshot.built_at > self.ttl
+
+    def _publish(self, snapshot: CatalogSnapshot) -> None:
+        # Более старая пересборка (или снимок с отстающей реплики) не должна
+        # затереть более свежий снимок
+        current = self._snapshot
+        if current is None or (
+            snapshot.version >= current.version and snapshot.revision >= current.revision
+        ):
+            self._snapshot = snapshot
+
+    def _refresh_in_background(self) -> None:
+        if self._background is None or self._background.done():
+            self._background = asyncio.create_task(self._background_refresh())
+
+    async def _background_refresh(self) -> None:
+        try:
+            async with read_session_maker() as db:
+                self._publish(await self._build(db, self.version))
+        except Exception:
+            logger.exception("Catalog snapshot rebuild failed")
+
+    async def _apply_remote(self, version: int) -> None:
+        try:
+            if self._snapshot is not None:
+                # С основной БД: реплика могла ещё не получить изменение
+                async with async_session_maker() as db:
+                    self._publish(await self._build(db, version))
+        except Exception:
+            logger.exception("Catalog snapshot rebuild after invalidation failed")
+
+    async def _build(self, db: AsyncSession, version: int) -> CatalogSnapshot:
+        # Ревизия читается раньше данных: запись между запросами даст новые
+        # данные со старой ревизией (клиент просто перезапросит), но не наоборот
+        revision = await db.execute(
+            select(CatalogRevision.revision, CatalogRevision.updated_at)
+            .where(CatalogRevision.id == 1)
+        )
+        # Без строки ревизии (до первой записи в БД без миграций) — ревизия 0,
+        # одинаковая у всех воркеров; первая запись создаст ревизию 1
+        revision, updated_at = revision.one_or_none() or (0, None)
+        products = await db.execute(
+            select(*Product.__table__.columns).where(Product.is_active == True)
+        )
+        categories = await db.execute(
+            select(*Category.__table__.columns).where(Category.is_active == True)
+        )
+        products_json, categories_json, compressed = await asyncio.to_thread(
+            _serialize, products.mappings().all(), categories.mappings().all()
+        )
+        self.rebuilds += 1
+        return CatalogSnapshot(
+            version=version,
+            built_at=time.monotonic(),
+            revision=revision,
+            last_modified=updated_at.timestamp() if updated_at else 0.0,
+            products_json=products_json,
+            categories_json=categories_json,
+            compressed=compressed,
+        )
+
+
+catalog_cache = CatalogCache(ttl=CATALOG_CACHE_TTL)
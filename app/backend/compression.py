@@ -0,0 +1,130 @@
+import gzip
+import zlib
+
+import brotli
+from starlette.datastructures import Headers, MutableHeaders
+
+from app.backend.config import COMPRESSION_MIN_SIZE
+from app.backend.static import accepted_encodings
+
+# Типы, которые имеет смысл сжимать; картинки и архивы уже сжаты
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/x-ndjson", "application/javascript", "image/svg+xml")
+
+# Уровни для ответов, сжимаемых на лету, и для предсжатых тел снимка каталога
+BROTLI_QUALITY = 5
+GZIP_LEVEL = 6
+BROTLI_STATIC_QUALITY = 9
+GZIP_STATIC_LEVEL = 9
+
+
+def choose_encoding(accept_encoding: str) -> str | None:
+    encodings = accepted_encodings(accept_encoding)
+    if "br" in encodings:
+        return "br"
+    if "gzip" in encodings:
+        return "gzip"
+    return None
+
+
+def encoded_etag(etag: str, encoding: str | None) -> str:
+    """ETag представления в кодировке encoding: сильный валидатор должен
+    различаться для разных Content-Encoding одного ресурса. Слабый ETag
+    не меняется."""
+    if encoding is None or etag.startswith("W/") or not etag.endswith('"'):
+        return etag
+    return f'{etag[:-1]}-{encoding}"'
+
+
+def compress(body: bytes, encoding: str, static: bool = False) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_STATIC_QUALITY if static else BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_STATIC_LEVEL if static else GZIP_LEVEL, mtime=0)
+
+
+class _StreamCompressor:
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+        self.encoding = encoding
+
+    def chunk(self, data: bytes) -> bytes:
+        # Каждый кусок сбрасывается сразу, чтобы потоковый ответ не застревал в буфере
+        if self.encoding == "br":
+            return self._compressor.process(data) + self._compressor.flush()
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.finish() if self.encoding == "br" else self._compressor.flush()
+
+
+class CompressionMiddleware:
+    """Сжатие ответов brotli или gzip по Accept-Encoding.
+
+    Не трогает маленькие ответы, несжимаемые типы, ответы с уже заданным
+    Content-Encoding (например, предсжатый снимок каталога) и пути из
+    exclude (/static отдаёт файлы и их предсжатые копии сам). Потоковые
+    ответы сжимаются по мере отправки.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE, exclude: tuple = ("/static",)):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.exclude = exclude
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "HEAD" or scope["path"].startswith(self.exclude):
+            return await self.app(scope, receive, send)
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            return await self.app(scope, receive, send)
+
+        start = None
+        passthrough = False
+        compressor = None
+
+        async def compressing_send(message):
+            nonlocal start, passthrough, compressor
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                start = message
+                passthrough = "content-encoding" in headers or not headers.get(
+                    "content-type", ""
+                ).startswith(COMPRESSIBLE_TYPES)
+                if passthrough:
+                    await send(message)
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if compressor is None:
+                headers = MutableHeaders(scope=start)
+                if not more_body and len(body) < self.minimum_size:
+                    passthrough = True
+                    await send(start)
+                    await send(message)
+                    return
+                headers["Content-Encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+                if "etag" in headers:
+                    headers["ETag"] = encoded_etag(headers["etag"], encoding)
+                if not more_body:
+                    body = compress(body, encoding)
+                    headers["Content-Length"] = str(len(body))
+                    await send(start)
+                    await send({"type": "http.response.body", "body": body})
+                    return
+                del headers["Content-Length"]
+                compressor = _StreamCompressor(encoding)
+                await send(start)
+
+            data = compressor.chunk(body) if body else b""
+            if not more_body:
+                data += compressor.finish()
+            await send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+        await self.app(scope, receive, compressing_send)
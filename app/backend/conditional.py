@@ -0,0 +1,70 @@
+from email.utils import formatdate, parsedate_to_datetime
+
+from fastapi import HTTPException, Request, Response, status
+
+from app.backend.catalog_cache import CatalogSnapshot, catalog_cache
+from app.backend.compression import choose_encoding
+
+
+def catalog_validators(etag: str, last_modified: float) -> dict[str, str]:
+    return {
+        "ETag": etag,
+        "Last-Modified": formatdate(last_modified, usegmt=True),
+        # Клиент может хранить ответ, но обязан сверять его с сервером
+        "Cache-Control": "no-cache",
+        # Тело каталога отдаётся предсжатым под Accept-Encoding
+        "Vary": "Accept-Encoding",
+    }
+
+
+def is_not_modified(request: Request, etag: str, last_modified: float) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # If-None-Match сравнивается слабо: префикс W/ не учитывается
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or etag.removeprefix("W/") in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return int(last_modified) <= since
+
+    return False
+
+
+async def catalog_conditional_get(request: Request, response: Response) -> None:
+    """Отвечает 304 до обращения к БД, если у клиента актуальная ревизия каталога."""
+    etag = catalog_cache.etag
+    if etag is None:
+        # Снимок ещё не собран: ревизия неизвестна, отвечаем без валидаторов
+        return
+    if is_not_modified(request, etag, catalog_cache.last_modified):
+        raise HTTPException(
+            status_code=status.HTTP_304_NOT_MODIFIED,
+            headers=catalog_validators(etag, catalog_cache.last_modified),
+        )
+    response.headers.update(catalog_validators(etag, catalog_cache.last_modified))
+
+
+def snapshot_response(
+    snapshot: CatalogSnapshot, name: str, request: Request, response: Response
+) -> Response:
+    """Готовое JSON-тело из снимка каталога, предсжатое под Accept-Encoding.
+
+    Свой Response не наследует заголовки catalog_conditional_get, поэтому
+    они копируются, а валидаторы берутся из самого снимка: снимок мог
+    смениться, пока обработчик ждал сессию.
+    """
+    body, encoding = snapshot.body(
+        name, choose_encoding(request.headers.get("accept-encoding", ""))
+    )
+    result = Response(body, media_type="application/json")
+    # MutableHeaders.update сравнивает имена без учёта регистра
+    result.headers.update(response.headers)
+    result.headers.update(catalog_validators(snapshot.etag, snapshot.last_modified))
+    if encoding is not None:
+        result.headers["Content-Encoding"] = encoding
+    return result
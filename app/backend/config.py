@@ -0,0 +1,120 @@
+import os
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    return value.lower() in ("1", "true", "yes", "on") if value else default
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+# База данных: основной DSN (запись) и необязательная реплика для чтения каталога
+# DSN с паролем в коде не храним: без DATABASE_URL не стартуют ни приложение, ни миграции
+DATABASE_URL = os.getenv("DATABASE_URL")
+if not DATABASE_URL:
+    raise RuntimeError("DATABASE_URL is not set")
+DATABASE_REPLICA_URL = os.getenv("DATABASE_REPLICA_URL") or None
+# Сколько секунд после записи в каталог читать с основной БД, пока реплика догоняет
+DATABASE_REPLICA_MAX_LAG = _env_float("DATABASE_REPLICA_MAX_LAG", 5.0)
+
+DB_ECHO = _env_bool("DB_ECHO", False)
+DB_POOL_SIZE = _env_int("DB_POOL_SIZE", 10)
+DB_MAX_OVERFLOW = _env_int("DB_MAX_OVERFLOW", 10)
+DB_POOL_TIMEOUT = _env_float("DB_POOL_TIMEOUT", 30.0)
+DB_POOL_RECYCLE = _env_int("DB_POOL_RECYCLE", 1800)
+DB_POOL_PRE_PING = _env_bool("DB_POOL_PRE_PING", True)
+DB_STATEMENT_CACHE_SIZE = _env_int("DB_STATEMENT_CACHE_SIZE", 500)
+# Прогрев при старте: сколько соединений открыть заранее (в каждом пуле) и
+# загружать ли снимок каталога до готовности воркера
+DB_WARM_CONNECTIONS = _env_int("DB_WARM_CONNECTIONS", 4)
+WARM_CATALOG = _env_bool("WARM_CATALOG", True)
+
+# Профилирование SQL по запросам (опционально): заголовок X-SQL-Profile в ответе
+# (только для отладки), пороги записи в лог медленных запросов и число
+# повторов одного выражения, после которого оно считается N+1
+SQL_PROFILE = _env_bool("SQL_PROFILE", False)
+SQL_PROFILE_HEADER = _env_bool("SQL_PROFILE_HEADER", False)
+SLOW_REQUEST_QUERIES = _env_int("SLOW_REQUEST_QUERIES", 20)
+SLOW_REQUEST_DB_SECONDS = _env_float("SLOW_REQUEST_DB_SECONDS", 0.5)
+SQL_REPEAT_THRESHOLD = _env_int("SQL_REPEAT_THRESHOLD", 3)
+
+# Запуск через app.serve: адрес, порт и число воркеров (0 — по числу доступных CPU)
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = _env_int("PORT", 8002)
+WEB_CONCURRENCY = _env_int("WEB_CONCURRENCY", 0)
+
+# Время жизни снимка каталога в памяти (секунды)
+CATALOG_CACHE_TTL = _env_float("CATALOG_CACHE_TTL", 300.0)
+
+# Число процессов для нарезки превью загруженных изображений
+IMAGE_WORKERS = _env_int("IMAGE_WORKERS", 2)
+
+# Загрузки: каталог хранения, максимальный размер файла и размер чанка (байты)
+UPLOAD_FOLDER = os.getenv("UPLOAD_FOLDER", "uploads")
+UPLOAD_MAX_BYTES = _env_int("UPLOAD_MAX_BYTES", 10 * 1024 * 1024)
+UPLOAD_CHUNK_SIZE = _env_int("UPLOAD_CHUNK_SIZE", 256 * 1024)
+
+# Массовый импорт/экспорт каталога: лимит файла импорта (байты) и размер пачки строк
+IMPORT_MAX_BYTES = _env_int("IMPORT_MAX_BYTES", 200 * 1024 * 1024)
+BULK_BATCH_SIZE = _env_int("BULK_BATCH_SIZE", 1000)
+
+# Каталог, через который воркеры app.serve складывают метрики для общего
+# /metrics (app.serve создаёт его сам), и период записи метрик воркера (секунды)
+METRICS_DIR = os.getenv("METRICS_DIR")
+METRICS_FLUSH_INTERVAL = _env_float("METRICS_FLUSH_INTERVAL", 5.0)
+
+# /products/feed не отдаёт товары, изменённые позже чем столько секунд назад:
+# долгая транзакция записи фиксирует строки с updated_at из прошлого
+FEED_SAFETY_LAG = _env_float("FEED_SAFETY_LAG", 600.0)
+
+# Ответы меньше этого размера (байты) не сжимаются
+COMPRESSION_MIN_SIZE = _env_int("COMPRESSION_MIN_SIZE", 1024)
+
+# max-age для /static: имена файлов уникальны, поэтому кэш может быть вечным
+STATIC_MAX_AGE = _env_int("STATIC_MAX_AGE", 365 * 24 * 3600)
+
+# Допуск запросов на запись корзины и оформление заказа; выключается для
+# нагрузочных прогонов, которые меряют само приложение
+ADMISSION_ENABLED = _env_bool("ADMISSION_ENABLED", True)
+# Запросов в секунду
+# на пользователя и запас сверх них (0 — без ограничения), сколько
+# пользователей помнить
+ADMISSION_USER_RATE = _env_float("ADMISSION_USER_RATE", 5.0)
+ADMISSION_USER_BURST = _env_int("ADMISSION_USER_BURST", 10)
+ADMISSION_MAX_USERS = _env_int("ADMISSION_MAX_USERS", 100_000)
+# Одновременных запросов по классам маршрутов (0 — по размеру пула) и доля
+# пула основной БД, которую запись оставляет чтению каталога
+ADMISSION_CART_CONCURRENCY = _env_int("ADMISSION_CART_CONCURRENCY", 0)
+ADMISSION_CHECKOUT_CONCURRENCY = _env_int("ADMISSION_CHECKOUT_CONCURRENCY", 0)
+ADMISSION_CATALOG_RESERVE = _env_float("ADMISSION_CATALOG_RESERVE", 0.25)
+# Запись отклоняется сразу, если очередь ожидания пула длиннее порога (0 — не проверять)
+ADMISSION_POOL_WAITING = _env_int("ADMISSION_POOL_WAITING", 4)
+ADMISSION_RETRY_AFTER = _env_int("ADMISSION_RETRY_AFTER", 1)
+
+# Сколько проверенных JWT держать в памяти
+TOKEN_CACHE_SIZE = _env_int("TOKEN_CACHE_SIZE", 10_000)
+
+# Outbox: размер пачки, пауза между опросами (секунды), число попыток доставки
+# и аренда взятой пачки (секунды): после неё сообщения упавшего воркера снова
+# доступны, поэтому она должна быть больше времени отправки пачки
+OUTBOX_BATCH_SIZE = _env_int("OUTBOX_BATCH_SIZE", 50)
+OUTBOX_POLL_INTERVAL = _env_float("OUTBOX_POLL_INTERVAL", 2.0)
+OUTBOX_MAX_ATTEMPTS = _env_int("OUTBOX_MAX_ATTEMPTS", 5)
+OUTBOX_LEASE_SECONDS = _env_float("OUTBOX_LEASE_SECONDS", 1800.0)
+
+# Почта: "smtp" отправляет, "stub" только пишет письма в лог (локально и в
+# тестах). Значения по умолчанию нет: транспорт задаётся явно
+MAIL_TRANSPORT = os.getenv("MAIL_TRANSPORT")
+MAIL_FROM = os.getenv("MAIL_FROM", "no-reply@pizza-catalog.local")
+SMTP_HOST = os.getenv("SMTP_HOST", "localhost")
+SMTP_PORT = _env_int("SMTP_PORT", 587)
+SMTP_USER = os.getenv("SMTP_USER")
+SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
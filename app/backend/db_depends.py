@@ -1,7 +1,26 @@
+import time
+
+from fastapi import Request
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.backend.db import async_session_maker
+from app.backend.catalog_cache import catalog_cache
+from app.backend.config import DATABASE_REPLICA_MAX_LAG
+from app.backend.db import async_session_maker, read_session_maker
+
+# GET-маршруты с этими тегами читают каталог с реплики
+READ_REPLICA_TAGS = {"products", "category"}
+
+
+def _use_replica(request: Request) -> bool:
+    if request.method not in ("GET", "HEAD"):
+        return False
+    route = request.scope.get("route")
+    if route is None or not READ_REPLICA_TAGS.intersection(route.tags):
+        return False
+    # Сразу после записи реплика может отставать: читаем с основной БД
+    return time.time() - catalog_cache.last_modified > DATABASE_REPLICA_MAX_LAG
 
 
-async def get_db() -> AsyncSession:
-    async with async_session_maker() as session:
+async def get_db(request: Request) -> AsyncSession:
+    session_maker = read_session_maker if _use_replica(request) else async_session_maker
+    async with session_maker() as session:
         yield session
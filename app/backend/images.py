@@ -0,0 +1,109 @@
+import asyncio
+import base64
+import io
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from urllib.parse import quote
+
+from PIL import Image, ImageFilter, ImageOps, features
+from sqlalchemy import update
+
+from app.backend.catalog_cache import catalog_cache
+from app.backend.config import IMAGE_WORKERS
+from app.backend.db import async_session_maker
+from app.models import Product
+
+logger = logging.getLogger(__name__)
+
+VARIANT_WIDTHS = (320, 640, 1024, 1600)
+PLACEHOLDER_WIDTH = 16
+
+# mime-тип -> (формат Pillow, расширение, параметры кодека).
+# Порядок важен: клиент выбирает первый поддерживаемый формат
+VARIANT_FORMATS = {
+    "image/avif": ("AVIF", "avif", {"quality": 55}),
+    "image/webp": ("WEBP", "webp", {"quality": 78, "method": 4}),
+    "image/jpeg": ("JPEG", "jpg", {"quality": 80, "optimize": True, "progressive": True}),
+}
+if not features.check("avif"):
+    del VARIANT_FORMATS["image/avif"]
+
+_pool: ProcessPoolExecutor | None = None
+_tasks: set[asyncio.Task] = set()
+
+
+def build_variants(source: str) -> dict:
+    """Нарезает уменьшенные копии изображения; выполняется в процессе пула.
+
+    Файлы кладутся рядом с оригиналом как <имя>-<ширина>.<ext>. Возвращает
+    то, что хранится в Product.image_variants: ширины, srcset по каждому
+    mime-типу и крошечное размытое превью в виде data URI.
+    """
+    source = Path(source)
+    with Image.open(source) as original:
+        image = ImageOps.exif_transpose(original)
+        image = image.convert("RGBA" if image.mode in ("RGBA", "LA", "P") else "RGB")
+
+    widths = [width for width in VARIANT_WIDTHS if width < image.width] or [image.width]
+    srcset = {}
+    for mime_type, (image_format, extension, options) in VARIANT_FORMATS.items():
+        entries = []
+        for width in widths:
+            height = round(image.height * width / image.width)
+            resized = image.resize((width, height), Image.LANCZOS)
+            if image_format == "JPEG" and resized.mode != "RGB":
+                resized = resized.convert("RGB")
+            name = f"{source.stem}-{width}.{extension}"
+            # Имена исходников — хеш содержимого: готовые копии не пересчитываем
+            if not source.with_name(name).exists():
+                resized.save(source.with_name(name), image_format, **options)
+            entries.append(f"/static/{quote(name)} {width}w")
+        srcset[mime_type] = ", ".join(entries)
+
+    height = max(1, round(image.height * PLACEHOLDER_WIDTH / image.width))
+    placeholder = image.resize((PLACEHOLDER_WIDTH, height)).filter(ImageFilter.GaussianBlur(1))
+    buffer = io.BytesIO()
+    placeholder.save(buffer, "WEBP", quality=40)
+
+    return {
+        "widths": widths,
+        "srcset": srcset,
+        "placeholder": "data:image/webp;base64," + base64.b64encode(buffer.getvalue()).decode(),
+    }
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn: дочерние процессы не наследуют event loop и соединения с БД
+        _pool = ProcessPoolExecutor(
+            max_workers=IMAGE_WORKERS, mp_context=multiprocessing.get_context("spawn")
+        )
+    return _pool
+
+
+def schedule_variants(product_id: int, image_url: str, source: Path) -> None:
+    """Запускает нарезку в фоне, не задерживая ответ на запрос загрузки."""
+    task = asyncio.create_task(_process(product_id, image_url, str(source)))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+
+
+async def _process(product_id: int, image_url: str, source: str) -> None:
+    try:
+        loop = asyncio.get_running_loop()
+        variants = await loop.run_in_executor(_get_pool(), build_variants, source)
+        async with async_session_maker() as db:
+            # Если картинку успели заменить, результат устарел и не сохраняется
+            await db.execute(
+                update(Product)
+                .where(Product.id == product_id, Product.image_url == image_url)
+                .values(image_variants=variants)
+            )
+            await catalog_cache.bump(db)
+            await db.commit()
+            await catalog_cache.refresh(db)
+    except Exception:
+        logger.exception("Image variants failed for product %s", product_id)
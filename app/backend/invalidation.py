@@ -0,0 +1,99 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+
+import asyncpg
+from sqlalchemy import func, select
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.backend.config import DATABASE_URL
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "catalog_invalidation"
+# Уникален для процесса: свои же уведомления слушатель пропускает
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+
+async def publish(db: AsyncSession, revision: int) -> None:
+    """Сообщает остальным воркерам об изменении каталога.
+
+    Вызывается в транзакции записи: Postgres доставит NOTIFY сразу при её
+    commit и отбросит при откате.
+    """
+    payload = json.dumps({"worker": WORKER_ID, "revision": revision})
+    await db.execute(select(func.pg_notify(CHANNEL, payload)))
+
+
+class InvalidationListener:
+    """Отдельное соединение asyncpg с LISTEN на канал инвалидации.
+
+    На каждое чужое уведомление вызывает on_invalidate(revision). После
+    потери соединения переподключается и на всякий случай тоже вызывает
+    on_invalidate: уведомления, пришедшие без подписки, потеряны.
+    """
+
+    def __init__(self, on_invalidate, dsn: str = DATABASE_URL):
+        self.on_invalidate = on_invalidate
+        self.dsn = make_url(dsn).set(drivername="postgresql").render_as_string(hide_password=False)
+        self.received = 0
+        self.reconnects = 0
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _notified(self, connection, pid, channel, payload) -> None:
+        try:
+            message = json.loads(payload)
+        except ValueError:
+            logger.warning("Malformed invalidation payload: %r", payload)
+            return
+        if message.get("worker") == WORKER_ID:
+            return
+        self.received += 1
+        self.on_invalidate(message.get("revision"))
+
+    async def _run(self) -> None:
+        delay = 0.5
+        while True:
+            connection = None
+            try:
+                connection = await asyncpg.connect(self.dsn)
+                lost = asyncio.Event()
+                connection.add_termination_listener(lambda _: lost.set())
+                await connection.add_listener(CHANNEL, self._notified)
+                if self.reconnects:
+                    self.on_invalidate(None)
+                delay = 0.5
+                await lost.wait()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Invalidation listener failed, reconnecting in %.1fs", delay)
+            finally:
+                if connection is not None and not connection.is_closed():
+                    await connection.close()
+            self.reconnects += 1
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30.0)
+
+    def stats(self) -> dict:
+        return {
+            "worker": WORKER_ID,
+            "received": self.received,
+            "reconnects": self.reconnects,
+        }
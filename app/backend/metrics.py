@@ -0,0 +1,292 @@
+import asyncio
+import logging
+import os
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from pathlib import Path
+
+from app.backend.config import METRICS_DIR, METRICS_FLUSH_INTERVAL
+from app.backend.db import QueryStats, current_queries, engine, pool_stats, replica_engine
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+UPLOAD_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Гистограмма в формате Prometheus: накопительные бакеты по набору меток."""
+
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts: dict[tuple, list[int]] = {}
+        self.sums: dict[tuple, float] = defaultdict(float)
+
+    def observe(self, labels: tuple, value: float) -> None:
+        counts = self.counts.get(labels)
+        if counts is None:
+            counts = self.counts[labels] = [0] * (len(self.buckets) + 1)
+        # Храним число попаданий в каждый бакет, накопительные суммы — при выводе
+        counts[bisect_left(self.buckets, value)] += 1
+        self.sums[labels] += value
+
+    def render(self, name: str, label_names: tuple) -> list[str]:
+        lines = []
+        for labels, counts in self.counts.items():
+            base = _labels(label_names, labels)
+            total = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                total += count
+                le = f'le="{bound}"'
+                lines.append(f"{name}_bucket{{{base + ',' if base else ''}{le}}} {total}")
+            lines.append(f"{name}_sum{{{base}}} {self.sums[labels]}")
+            lines.append(f"{name}_count{{{base}}} {total}")
+        return lines
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: tuple, values: tuple) -> str:
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+
+
+class Metrics:
+    """Метрики приложения в памяти процесса.
+
+    Метки маршрутов — шаблоны путей ("/products/detail/{product_slug}"),
+    поэтому число рядов ограничено числом маршрутов.
+    """
+
+    def __init__(self):
+        self.requests: dict[tuple, int] = defaultdict(int)
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.queries = Histogram(QUERY_BUCKETS)
+        self.in_flight = 0
+        self.upload_bytes = 0
+        self.upload_duration = Histogram(UPLOAD_BUCKETS)
+        # Другие источники метрик: функции, возвращающие строки в формате Prometheus
+        self.collectors = []
+
+    def observe_request(self, method: str, route: str, status: int, seconds: float, queries: int) -> None:
+        self.requests[(method, route, status)] += 1
+        self.latency.observe((method, route), seconds)
+        self.queries.observe((method, route), queries)
+
+    def observe_upload(self, size: int, seconds: float) -> None:
+        self.upload_bytes += size
+        self.upload_duration.observe((), seconds)
+
+    def render(self) -> str:
+        lines = [
+            "# HELP http_requests_total HTTP requests by route and status.",
+            "# TYPE http_requests_total counter",
+        ]
+        for labels, count in self.requests.items():
+            lines.append(f"http_requests_total{{{_labels(('method', 'route', 'status'), labels)}}} {count}")
+
+        lines += [
+            "# HELP http_request_duration_seconds HTTP request latency.",
+            "# TYPE http_request_duration_seconds histogram",
+            *self.latency.render("http_request_duration_seconds", ("method", "route")),
+            "# HELP http_requests_in_flight HTTP requests being processed.",
+            "# TYPE http_requests_in_flight gauge",
+            f"http_requests_in_flight {self.in_flight}",
+            "# HELP db_queries_per_request SQL statements executed per HTTP request.",
+            "# TYPE db_queries_per_request histogram",
+            *self.queries.render("db_queries_per_request", ("method", "route")),
+            "# HELP upload_bytes_total Bytes of uploaded images stored.",
+            "# TYPE upload_bytes_total counter",
+            f"upload_bytes_total {self.upload_bytes}",
+            "# HELP upload_duration_seconds Time to stream an upload to disk.",
+            "# TYPE upload_duration_seconds histogram",
+            *self.upload_duration.render("upload_duration_seconds", ()),
+        ]
+
+        pools = {"primary": engine}
+        if replica_engine is not engine:
+            pools["replica"] = replica_engine
+        gauges = {
+            "db_pool_size": ("gauge", "size"),
+            "db_pool_checked_out": ("gauge", "checked_out"),
+            "db_pool_overflow": ("gauge", "overflow"),
+            "db_pool_waiting": ("gauge", "waiting"),
+            "db_pool_checkouts_total": ("counter", "checkouts"),
+            "db_pool_wait_seconds_total": ("counter", "wait_total"),
+            "db_pool_wait_seconds_max": ("gauge", "wait_max"),
+        }
+        stats = {name: pool_stats(pool_engine) for name, pool_engine in pools.items()}
+        for metric, (kind, key) in gauges.items():
+            lines.append(f"# TYPE {metric} {kind}")
+            for name in stats:
+                lines.append(f'{metric}{{pool="{name}"}} {stats[name][key]}')
+
+        for collect in self.collectors:
+            lines += collect()
+        return "\n".join(lines) + "\n"
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def merge_expositions(texts: list[tuple[str, bool]]) -> str:
+    """Складывает вывод render() нескольких воркеров: (текст, жив ли воркер).
+
+    Одинаковые ряды суммируются, у gauge с суффиксом _max берётся максимум.
+    От завершившихся воркеров берутся только counter и histogram, чтобы
+    суммы не уменьшались; их gauge уже не имеют смысла.
+    """
+    types: dict[str, str] = {}
+    helps: dict[str, str] = {}
+    families: dict[str, dict[str, float]] = {}
+    for text, alive in texts:
+        family = None
+        for line in text.splitlines():
+            if line.startswith("# TYPE "):
+                _, _, family, kind = line.split(" ", 3)
+                types.setdefault(family, kind)
+                families.setdefault(family, {})
+                continue
+            if line.startswith("# HELP "):
+                helps.setdefault(line.split(" ", 3)[2], line)
+                continue
+            if not line or line.startswith("#") or family is None:
+                continue
+            if not alive and types[family] == "gauge":
+                continue
+            series, value = line.rsplit(" ", 1)
+            samples = families[family]
+            if series in samples and types[family] == "gauge" and family.endswith("_max"):
+                samples[series] = max(samples[series], float(value))
+            else:
+                samples[series] = samples.get(series, 0.0) + float(value)
+
+    lines = []
+    for family, samples in families.items():
+        if family in helps:
+            lines.append(helps[family])
+        lines.append(f"# TYPE {family} {types[family]}")
+        lines += [f"{series} {_format_value(value)}" for series, value in samples.items()]
+    return "\n".join(lines) + "\n"
+
+
+class MultiprocessMetrics:
+    """Общий /metrics для нескольких воркеров uvicorn (app.serve).
+
+    Скрейп попадает в случайный воркер, поэтому каждый воркер периодически
+    пишет свой render() в файл каталога METRICS_DIR, а отвечающий на
+    скрейп воркер складывает файлы всех. Данные других воркеров отстают
+    не больше чем на flush_interval. Без METRICS_DIR отдаются метрики
+    своего процесса.
+    """
+
+    def __init__(self, metrics: Metrics, directory: str | None, flush_interval: float):
+        self.metrics = metrics
+        self.directory = Path(directory) if directory else None
+        self.flush_interval = flush_interval
+        # pid может повториться после перезапуска воркера, время старта — нет
+        self.path = (
+            self.directory / f"{os.getpid()}-{time.time_ns()}.prom" if self.directory else None
+        )
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        if self.directory is not None and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            self.flush()
+
+    def flush(self) -> str:
+        text = self.metrics.render()
+        if self.path is not None:
+            temporary = self.path.with_suffix(".tmp")
+            temporary.write_text(text)
+            temporary.replace(self.path)
+        return text
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                self.flush()
+            except OSError:
+                logger.exception("Metrics flush failed")
+            await asyncio.sleep(self.flush_interval)
+
+    def render(self) -> str:
+        own = self.flush()
+        if self.directory is None:
+            return own
+        # Воркер, давно не обновлявший файл, считается завершившимся
+        stale_before = time.time() - 3 * self.flush_interval
+        texts = [(own, True)]
+        for path in self.directory.glob("*.prom"):
+            if path == self.path:
+                continue
+            try:
+                texts.append((path.read_text(), path.stat().st_mtime >= stale_before))
+            except OSError:
+                continue
+        return merge_expositions(texts)
+
+
+metrics = Metrics()
+exporter = MultiprocessMetrics(metrics, METRICS_DIR, METRICS_FLUSH_INTERVAL)
+
+
+def _route_label(scope) -> str:
+    # Маршрут известен только после роутинга: он дописывается в scope
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    if "endpoint" in scope:
+        # Смонтированное приложение (/static): одна метка на весь mount
+        return scope.get("root_path") or "/"
+    return "unmatched"
+
+
+class MetricsMiddleware:
+    """Чистый ASGI middleware: время, статус и число SQL-запросов на запрос."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = 500
+        queries = QueryStats()
+        token = current_queries.set(queries)
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        metrics.in_flight += 1
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            metrics.in_flight -= 1
+            current_queries.reset(token)
+            metrics.observe_request(
+                scope["method"],
+                _route_label(scope),
+                status,
+                time.perf_counter() - started,
+                queries.count,
+            )
@@ -0,0 +1,79 @@
+import logging
+import smtplib
+from email.message import EmailMessage
+
+import anyio
+
+from app.backend.config import (
+    MAIL_FROM,
+    MAIL_TRANSPORT,
+    SMTP_HOST,
+    SMTP_PASSWORD,
+    SMTP_PORT,
+    SMTP_USER,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def build_order_email(first_name: str, lines: list[dict], total_price: int) -> tuple[str, str]:
+    subject = "Ваш заказ успешно оформлен"
+    body = (
+        f"Здравствуйте, {first_name}!\n\n"
+        "Ваш заказ был успешно оформлен. Подробности:\n\n"
+        + "\n".join(
+            [
+                f"{item['quantity']}x {item['product_name']} "
+                f"({item['radius']} см) - {item['total_price']} руб."
+                for item in lines
+            ]
+        )
+        + f"\n\nОбщая сумма: {total_price} руб.\n\nСпасибо за заказ!"
+    )
+    return subject, body
+
+
+class PermanentDeliveryError(Exception):
+    """Письмо нельзя доставить никогда: повторять отправку не нужно."""
+
+
+def _check_recipient(message: dict) -> None:
+    if not message.get("to"):
+        raise PermanentDeliveryError("Message has no recipient")
+
+
+class StubTransport:
+    """Ничего не отправляет, только пишет письмо в лог (локально и в тестах)."""
+
+    async def send(self, message: dict) -> None:
+        _check_recipient(message)
+        logger.info("Email to %s: %s", message.get("to"), message.get("subject"))
+
+
+class SMTPTransport:
+    async def send(self, message: dict) -> None:
+        _check_recipient(message)
+        email = EmailMessage()
+        email["From"] = MAIL_FROM
+        email["To"] = message["to"]
+        email["Subject"] = message["subject"]
+        email.set_content(message["body"])
+        # smtplib блокирующий, поэтому отправка идёт в потоке
+        await anyio.to_thread.run_sync(self._send, email)
+
+    @staticmethod
+    def _send(email: EmailMessage) -> None:
+        with smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=30) as smtp:
+            smtp.starttls()
+            if SMTP_USER:
+                smtp.login(SMTP_USER, SMTP_PASSWORD)
+            smtp.send_message(email)
+
+
+def make_transport():
+    # Без явного выбора письма в проде молча помечались бы отправленными
+    if MAIL_TRANSPORT == "smtp":
+        return SMTPTransport()
+    if MAIL_TRANSPORT == "stub":
+        return StubTransport()
+    raise RuntimeError(f'MAIL_TRANSPORT must be "smtp" or "stub", got {MAIL_TRANSPORT!r}')
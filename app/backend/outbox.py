@@ -0,0 +1,150 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import func, select
+
+from app.backend.config import (
+    OUTBOX_BATCH_SIZE,
+    OUTBOX_LEASE_SECONDS,
+    OUTBOX_MAX_ATTEMPTS,
+    OUTBOX_POLL_INTERVAL,
+)
+from app.backend.db import async_session_maker
+from app.backend.notifications import PermanentDeliveryError, make_transport
+from app.models import OutboxMessage
+
+logger = logging.getLogger(__name__)
+
+
+class OutboxWorker:
+    """Фоновая доставка сообщений из таблицы outbox.
+
+    Сообщения берутся пачками в аренду через FOR UPDATE SKIP LOCKED, поэтому
+    воркеры нескольких процессов не мешают друг другу; отправка идёт уже
+    после commit. Неудачная отправка повторяется с экспоненциальной паузой,
+    после max_attempts или при постоянной ошибке сообщение помечается как
+    failed.
+    """
+
+    def __init__(
+        self, transport, batch_size: int, poll_interval: float, max_attempts: int, lease: float
+    ):
+        self.transport = transport
+        self.lease = lease
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.sent = 0
+        self.failed = 0
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def wake(self) -> None:
+        """Новое сообщение записано: не ждать следующего опроса."""
+        self._wakeup.set()
+
+    async def _claim(self) -> list[tuple[int, dict]]:
+        """Берёт пачку сообщений в аренду и сразу фиксирует транзакцию.
+
+        Аренда — сдвиг available_at на lease секунд: пока идёт отправка,
+        другие воркеры сообщение не берут, а если процесс упадёт, оно снова
+        станет доступным после окончания аренды.
+        """
+        async with async_session_maker() as db:
+            messages = await db.scalars(
+                select(OutboxMessage)
+                .where(
+                    OutboxMessage.status == "pending",
+                    OutboxMessage.available_at <= func.now(),
+                )
+                .order_by(OutboxMessage.id)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            claimed = []
+            lease_until = datetime.now(timezone.utc) + timedelta(seconds=self.lease)
+            for message in messages.all():
+                message.available_at = lease_until
+                claimed.append((message.id, message.payload))
+            await db.commit()
+        return claimed
+
+    async def drain_once(self) -> int:
+        claimed = await self._claim()
+        # Отправка идёт вне транзакции: соединение с БД не держится
+        # открытым, пока почтовый сервер отвечает
+        results = {}
+        for message_id, payload in claimed:
+            try:
+                await self.transport.send(payload)
+            except Exception as e:
+                results[message_id] = e
+            else:
+                results[message_id] = None
+
+        if not results:
+            return 0
+        async with async_session_maker() as db:
+            messages = await db.scalars(
+                select(OutboxMessage).where(OutboxMessage.id.in_(results))
+            )
+            for message in messages:
+                error = results[message.id]
+                if error is None:
+                    message.status = "sent"
+                    message.sent_at = datetime.now(timezone.utc)
+                    self.sent += 1
+                    continue
+                message.attempts += 1
+                message.last_error = str(error)[:500]
+                # Постоянную ошибку (нет получателя и т.п.) повторять бессмысленно
+                if isinstance(error, PermanentDeliveryError) or message.attempts >= self.max_attempts:
+                    message.status = "failed"
+                    self.failed += 1
+                else:
+                    delay = timedelta(seconds=2 ** message.attempts)
+                    message.available_at = datetime.now(timezone.utc) + delay
+            await db.commit()
+        return len(claimed)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                drained = await self.drain_once()
+            except Exception:
+                logger.exception("Outbox drain failed")
+                drained = 0
+            # Полная пачка — скорее всего, есть ещё сообщения
+            if drained == self.batch_size:
+                continue
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def stats(self) -> dict:
+        return {"sent": self.sent, "failed": self.failed}
+
+
+outbox_worker = OutboxWorker(
+    make_transport(),
+    batch_size=OUTBOX_BATCH_SIZE,
+    poll_interval=OUTBOX_POLL_INTERVAL,
+    max_attempts=OUTBOX_MAX_ATTEMPTS,
+    lease=OUTBOX_LEASE_SECONDS,
+)
@@ -0,0 +1,153 @@
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+from sqlalchemy import event
+
+from app.backend.config import (
+    SLOW_REQUEST_DB_SECONDS,
+    SLOW_REQUEST_QUERIES,
+    SQL_PROFILE_HEADER,
+    SQL_REPEAT_THRESHOLD,
+)
+from app.backend.db import engine, replica_engine
+
+logger = logging.getLogger(__name__)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PARAMETER = re.compile(r"\$\d+|%\(\w+\)s|\?")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_VALUES_ROWS = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)(?:\s*,\s*\(\s*\?(?:\s*,\s*\?)*\s*\))+")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize(statement: str) -> str:
+    """Форма выражения без значений: литералы и параметры заменяются на ?,
+    списки IN (...) и строки VALUES схлопываются."""
+    statement = _STRING.sub("?", statement)
+    statement = _PARAMETER.sub("?", statement)
+    statement = _NUMBER.sub("?", statement)
+    statement = _VALUES_ROWS.sub("(...)", statement)
+    statement = _IN_LIST.sub("(...)", statement)
+    return _SPACES.sub(" ", statement).strip()
+
+
+@dataclass
+class SQLProfile:
+    """Выполненные за запрос выражения: (нормализованный текст, секунды)."""
+
+    statements: list[tuple[str, float]] = field(default_factory=list)
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    @property
+    def db_time(self) -> float:
+        return sum(seconds for _, seconds in self.statements)
+
+    def repeated(self, threshold: int = SQL_REPEAT_THRESHOLD) -> dict[str, int]:
+        """Выражения одной формы, выполненные threshold и более раз (признак N+1)."""
+        shapes = Counter(statement for statement, _ in self.statements)
+        return {statement: count for statement, count in shapes.most_common() if count >= threshold}
+
+    def summary(self) -> str:
+        return f"queries={self.count}; db_ms={self.db_time * 1000:.1f}; repeated={len(self.repeated())}"
+
+
+current_profile: ContextVar[SQLProfile | None] = ContextVar("current_profile", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if current_profile.get() is not None:
+        conn.info.setdefault("profile_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = current_profile.get()
+    if profile is not None and conn.info.get("profile_started"):
+        started = conn.info["profile_started"].pop()
+        profile.statements.append((normalize(statement), time.perf_counter() - started))
+
+
+def instrument(async_engine) -> None:
+    """Подключает профилировщик к движку (приложения или тестовому)."""
+    event.listen(async_engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(async_engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+for _engine in {engine, replica_engine}:
+    instrument(_engine)
+
+
+@contextmanager
+def profile_sql():
+    profile = SQLProfile()
+    token = current_profile.set(profile)
+    try:
+        yield profile
+    finally:
+        current_profile.reset(token)
+
+
+@contextmanager
+def assert_max_queries(limit: int):
+    """Для тестов и бенчмарков: AssertionError, если в блоке выполнено больше
+    limit SQL-выражений.
+
+        with assert_max_queries(2):
+            await client.get("/cart/get", headers=auth)
+    """
+    with profile_sql() as profile:
+        yield profile
+    if profile.count > limit:
+        details = "\n".join(
+            f"  {seconds * 1000:7.2f} ms  {statement}" for statement, seconds in profile.statements
+        )
+        raise AssertionError(f"Expected at most {limit} queries, got {profile.count}:\n{details}")
+
+
+class SQLProfilerMiddleware:
+    """Профилирование SQL каждого запроса; включается через SQL_PROFILE.
+
+    Медленные запросы (много выражений, долго в БД или повторы одной формы)
+    пишутся в лог. С SQL_PROFILE_HEADER сводка отдаётся в заголовке
+    X-SQL-Profile — учитываются выражения, выполненные до начала ответа.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and SQL_PROFILE_HEADER:
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (b"x-sql-profile", profile.summary().encode()),
+                ]
+            await send(message)
+
+        with profile_sql() as profile:
+            await self.app(scope, receive, send_wrapper)
+
+        repeated = profile.repeated()
+        if (
+            profile.count > SLOW_REQUEST_QUERIES
+            or profile.db_time > SLOW_REQUEST_DB_SECONDS
+            or repeated
+        ):
+            logger.warning(
+                "Slow request %s %s: %s%s",
+                scope["method"],
+                scope["path"],
+                profile.summary(),
+                "".join(f"\n  {count}x {statement}" for statement, count in repeated.items()),
+            )
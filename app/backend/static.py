@@ -0,0 +1,126 @@
+import os
+from collections import Counter
+from mimetypes import guess_type
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Receive, Scope, Send
+
+from app.backend.config import STATIC_MAX_AGE
+
+# Предсжатые копии рядом с оригиналом в порядке предпочтения
+PRECOMPRESSED = (("br", ".br"), ("gzip", ".gz"))
+
+
+def accepted_encodings(accept_encoding: str) -> set[str]:
+    """Кодировки из Accept-Encoding, кроме явно запрещённых через q=0."""
+    encodings = set()
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        if params.replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        if name:
+            encodings.add(name.strip().lower())
+    return encodings
+
+
+class MediaFileResponse(FileResponse):
+    """FileResponse с передачей файла серверу целиком (ASGI pathsend).
+
+    Если сервер поддерживает расширение http.response.pathsend, файл
+    отправляется им самим (sendfile) без чтения в процесс приложения.
+    Запросы с Range и HEAD обслуживаются обычным путём.
+    """
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            "http.response.pathsend" in scope.get("extensions", {})
+            and scope["method"] == "GET"
+            and "range" not in Headers(scope=scope)
+        ):
+            await send({
+                "type": "http.response.start",
+                "status": self.status_code,
+                "headers": self.raw_headers,
+            })
+            await send({"type": "http.response.pathsend", "path": str(self.path)})
+            return
+        await super().__call__(scope, receive, send)
+
+
+class MediaFiles(StaticFiles):
+    """Раздача загруженных изображений.
+
+    Имена файлов уникальны (хеш содержимого), поэтому ответы кэшируются
+    навсегда (immutable). Если рядом лежит предсжатая копия (.br/.gz), она
+    отдаётся клиентам, которые её принимают. Считается, сколько байт отдано
+    по каждому файлу.
+    """
+
+    def __init__(self, *args, max_age: int = STATIC_MAX_AGE, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cache_control = f"public, max-age={max_age}, immutable"
+        self.requests = Counter()
+        self.bytes_served = Counter()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        path = scope["path"]
+
+        async def counting_send(message):
+            if message["type"] == "http.response.start":
+                self.requests[path] += 1
+                if message["status"] in (200, 206) and scope["method"] != "HEAD":
+                    for name, value in message["headers"]:
+                        if name == b"content-length":
+                            self.bytes_served[path] += int(value)
+            await send(message)
+
+        await super().__call__(scope, receive, counting_send)
+
+    def file_response(
+        self,
+        full_path,
+        stat_result: os.stat_result,
+        scope: Scope,
+        status_code: int = 200,
+    ) -> Response:
+        request_headers = Headers(scope=scope)
+        headers = {"Cache-Control": self.cache_control, "Vary": "Accept-Encoding"}
+        # Тип содержимого — по оригиналу, а не по расширению .br/.gz
+        media_type = guess_type(str(full_path))[0] or "text/plain"
+
+        # Диапазоны считаются по несжатому файлу, поэтому с Range отдаём оригинал
+        if "range" not in request_headers:
+            encodings = accepted_encodings(request_headers.get("accept-encoding", ""))
+            for encoding, suffix in PRECOMPRESSED:
+                if encoding not in encodings:
+                    continue
+                try:
+                    compressed_stat = os.stat(f"{full_path}{suffix}")
+                except OSError:
+                    continue
+                full_path, stat_result = f"{full_path}{suffix}", compressed_stat
+                headers["Content-Encoding"] = encoding
+                break
+
+        response = MediaFileResponse(
+            full_path,
+            status_code=status_code,
+            headers=headers,
+            media_type=media_type,
+            stat_result=stat_result,
+        )
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+    def stats(self, top: int = 20) -> dict:
+        return {
+            "requests": sum(self.requests.values()),
+            "bytes_served": sum(self.bytes_served.values()),
+            "top_files": [
+                {"path": path, "requests": self.requests[path], "bytes": size}
+                for path, size in self.bytes_served.most_common(top)
+            ],
+        }
@@ -0,0 +1,215 @@
+import hashlib
+import os
+import re
+import time
+import uuid
+from pathlib import Path
+
+import anyio
+from fastapi import HTTPException, UploadFile, status
+
+from app.backend.config import UPLOAD_CHUNK_SIZE, UPLOAD_FOLDER, UPLOAD_MAX_BYTES
+from app.backend.metrics import metrics
+
+# Сигнатуры начала файла -> (mime-тип, расширение)
+IMAGE_SIGNATURES = (
+    (b"\xff\xd8\xff", "image/jpeg", ".jpg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png", ".png"),
+    (b"GIF87a", "image/gif", ".gif"),
+    (b"GIF89a", "image/gif", ".gif"),
+)
+ALLOWED_CONTENT_TYPES = {"image/jpeg", "image/png", "image/gif", "image/webp"}
+
+# Запас на поля формы и границы multipart сверх размера самого файла
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+def _sniff(head: bytes) -> tuple[str, str] | None:
+    for signature, content_type, extension in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return content_type, extension
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp", ".webp"
+    return None
+
+
+async def store_upload(file: UploadFile) -> Path:
+    """Потоково сохраняет картинку под именем sha256 её содержимого.
+
+    Тип проверяется по заголовку и по первым байтам до чтения остального
+    тела, размер — по мере чтения. Повторная загрузка того же файла не
+    создаёт копию: возвращается путь уже сохранённого.
+    """
+    if file.content_type not in ALLOWED_CONTENT_TYPES:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Only JPEG, PNG, GIF and WebP images are allowed",
+        )
+
+    started = time.perf_counter()
+    chunk = await file.read(UPLOAD_CHUNK_SIZE)
+    sniffed = _sniff(chunk)
+    if sniffed is None:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="File content is not a supported image",
+        )
+
+    folder = Path(UPLOAD_FOLDER)
+    temporary = folder / f".{uuid.uuid4()}.part"
+    folder.mkdir(parents=True, exist_ok=True)
+
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        async with await anyio.open_file(temporary, "wb") as out:
+            while chunk:
+                size += len(chunk)
+                if size > UPLOAD_MAX_BYTES:
+                    raise HTTPException(
+                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        detail=f"File is larger than {UPLOAD_MAX_BYTES} bytes",
+                    )
+                digest.update(chunk)
+                await out.write(chunk)
+                chunk = await file.read(UPLOAD_CHUNK_SIZE)
+
+        location = folder / f"{digest.hexdigest()}{sniffed[1]}"
+        if location.exists():
+            os.unlink(temporary)
+        else:
+            os.replace(temporary, location)
+    except BaseException:
+        temporary.unlink(missing_ok=True)
+        raise
+    metrics.observe_upload(size, time.perf_counter() - started)
+    return location
+
+
+def _multipart_boundary(content_type: bytes) -> bytes | None:
+    for parameter in content_type.split(b";")[1:]:
+        name, _, value = parameter.strip().partition(b"=")
+        if name.lower() == b"boundary" and value:
+            return value.strip(b'"')
+    return None
+
+
+def check_image_part(buffer: bytes, boundary: bytes) -> bool | None:
+    """Проверяет первую файловую часть multipart по началу тела.
+
+    True — заявленный тип и сигнатура файла допустимы, False — нет,
+    None — файловая часть ещё не дошла или дошла не целиком.
+    """
+    delimiter = b"--" + boundary
+    position = 0
+    while True:
+        start = buffer.find(delimiter, position)
+        if start < 0:
+            return None
+        headers_end = buffer.find(b"\r\n\r\n", start)
+        if headers_end < 0:
+            return None
+        position = headers_end + 4
+        headers = buffer[start + len(delimiter):headers_end].decode("latin-1").lower()
+        # Поле без файла или пустое поле файла (файл не выбран) пропускаем
+        if "filename=" not in headers or 'filename=""' in headers:
+            continue
+        content_type = ""
+        for line in headers.split("\r\n"):
+            name, _, value = line.partition(":")
+            if name.strip() == "content-type":
+                content_type = value.strip()
+        if content_type not in ALLOWED_CONTENT_TYPES:
+            return False
+        head = buffer[position:position + 12]
+        if len(head) < 12:
+            return None
+        return _sniff(head) is not None
+
+
+async def _reject(send, status_code: int, detail: bytes) -> None:
+    await send({
+        "type": "http.response.start",
+        "status": status_code,
+        "headers": [(b"content-type", b"application/json")],
+    })
+    await send({"type": "http.response.body", "body": b'{"detail":"' + detail + b'"}'})
+
+
+class UploadLimitMiddleware:
+    """Отклоняет слишком большие и не те multipart-запросы до разбора тела.
+
+    FastAPI целиком читает форму ещё до вызова обработчика, поэтому лимит
+    проверяется здесь: по Content-Length сразу, а без него — по мере
+    поступления тела. limits задаёт отдельные лимиты для путей (импорт
+    каталога). Для путей из image_paths (регулярные выражения) тип и
+    сигнатура файла проверяются по первым пришедшим байтам: не картинка
+    получает 415, не дожидаясь загрузки остального тела.
+    """
+
+    def __init__(
+        self,
+        app,
+        max_body: int = UPLOAD_MAX_BYTES + MULTIPART_OVERHEAD,
+        limits: dict[str, int] | None = None,
+        image_paths: tuple[str, ...] = (),
+    ):
+        self.app = app
+        self.max_body = max_body
+        self.limits = limits or {}
+        self.image_paths = [re.compile(pattern) for pattern in image_paths]
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        headers = dict(scope["headers"])
+        content_type = headers.get(b"content-type", b"")
+        if not content_type.startswith(b"multipart/form-data"):
+            return await self.app(scope, receive, send)
+
+        max_body = self.limits.get(scope["path"], self.max_body)
+        content_length = headers.get(b"content-length")
+        if content_length is not None:
+            try:
+                content_length = int(content_length)
+            except ValueError:
+                return await _reject(send, status.HTTP_400_BAD_REQUEST, b"Invalid Content-Length")
+            if content_length > max_body:
+                return await _reject(
+                    send, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, b"Request body is too large"
+                )
+
+        boundary = None
+        if any(pattern.fullmatch(scope["path"]) for pattern in self.image_paths):
+            boundary = _multipart_boundary(content_type)
+        # Начало тела копится, пока не станет ясно, картинка ли в файловой части
+        head = b""
+        received = 0
+
+        async def limited_receive():
+            nonlocal received, head, boundary
+            message = await receive()
+            body = message.get("body", b"")
+            received += len(body)
+            if received > max_body:
+                raise HTTPException(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    detail="Request body is too large",
+                )
+            if boundary is not None:
+                head += body
+                verdict = check_image_part(head, boundary)
+                if verdict is False:
+                    raise HTTPException(
+                        status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                        detail="Only JPEG, PNG, GIF and WebP images are allowed",
+                    )
+                # Решение принято или файла в начале тела нет: дальше не копим,
+                # остальное проверит store_upload
+                if verdict is True or len(head) > MULTIPART_OVERHEAD:
+                    boundary = None
+                    head = b""
+            return message
+
+        await self.app(scope, limited_receive, send)
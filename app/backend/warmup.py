@@ -0,0 +1,125 @@
+import asyncio
+import logging
+import time
+
+from fastapi import HTTPException, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.backend.catalog_cache import catalog_cache
+from app.backend.config import DB_POOL_SIZE, DB_WARM_CONNECTIONS, WARM_CATALOG
+from app.backend.db import engine, read_session_maker, replica_engine
+from app.routers import cart, products
+
+logger = logging.getLogger(__name__)
+
+# Несуществующие slug/пользователь: запросы выполняются, но ничего не находят
+WARMUP_KEY = "__warmup__"
+
+# Горячие запросы вызываются через сами обработчики, поэтому текст SQL
+# совпадает с боевым и подготовленные выражения попадают в кэш соединения
+CATALOG_PRIMERS = (
+    lambda db: products.all_products(
+        db=db, request=Request({"type": "http", "headers": []}), response=Response(), limit=20
+    ),
+    lambda db: products.product_by_category(db=db, category_slug=WARMUP_KEY),
+    lambda db: products.product_detail(db=db, product_slug=WARMUP_KEY),
+    lambda db: products.search_products(db=db, q=WARMUP_KEY, limit=20, cursor=None),
+)
+CART_PRIMERS = (
+    lambda db: cart._cart_lines(db, WARMUP_KEY),
+)
+
+
+async def _prime(pool_engine, primers, count: int) -> None:
+    async def prime_connection():
+        async with pool_engine.connect() as conn:
+            async with AsyncSession(bind=conn) as db:
+                for primer in primers:
+                    try:
+                        await primer(db)
+                    except HTTPException:
+                        pass
+                await db.rollback()
+
+    # Соединения держатся одновременно, поэтому открываются count разных
+    await asyncio.gather(*(prime_connection() for _ in range(count)))
+
+
+class Warmup:
+    """Прогрев воркера после старта и его готовность для /readyz.
+
+    Открывает соединения пулов заранее (TCP/TLS, аутентификация, интроспекция
+    типов asyncpg), готовит выражения горячих запросов и загружает снимок
+    каталога. Пока прогрев не завершён, воркер не готов; при недоступной БД
+    попытки повторяются.
+    """
+
+    def __init__(self, connections: int, load_catalog: bool):
+        self.connections = min(connections, DB_POOL_SIZE)
+        self.load_catalog = load_catalog
+        self.ready = False
+        self.import_seconds: float | None = None
+        self.warmup_seconds: float | None = None
+        self.attempts = 0
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        # При остановке сразу снимаем готовность, чтобы балансировщик увёл трафик
+        self.ready = False
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        delay = 0.5
+        while True:
+            self.attempts += 1
+            started = time.perf_counter()
+            try:
+                await self.warm()
+            except Exception:
+                logger.exception("Warmup attempt %s failed", self.attempts)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30.0)
+                continue
+            self.warmup_seconds = time.perf_counter() - started
+            self.ready = True
+            logger.info(
+                "Worker ready: import %.3fs, warmup %.3fs",
+                self.import_seconds or 0.0,
+                self.warmup_seconds,
+            )
+            return
+
+    async def warm(self) -> None:
+        if self.connections > 0:
+            if replica_engine is engine:
+                await _prime(engine, CATALOG_PRIMERS + CART_PRIMERS, self.connections)
+            else:
+                await asyncio.gather(
+                    _prime(engine, CART_PRIMERS, self.connections),
+                    _prime(replica_engine, CATALOG_PRIMERS, self.connections),
+                )
+        if self.load_catalog:
+            async with read_session_maker() as db:
+                await catalog_cache.get(db)
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.ready,
+            "import_seconds": self.import_seconds,
+            "warmup_seconds": self.warmup_seconds,
+            "attempts": self.attempts,
+            "connections": self.connections,
+        }
+
+
+warmup = Warmup(DB_WARM_CONNECTIONS, WARM_CATALOG)
@@ -1,11 +1,63 @@
-from fastapi.staticfiles import StaticFiles
+import time
+
+# Время импорта приложения (зависимости, модели, роутеры) — для /readyz и /stats
+_import_started = time.perf_counter()
+
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse, PlainTextResponse
 from app.routers import category, products, cart
 from fastapi.middleware.cors import CORSMiddleware
+from app.backend.catalog_cache import catalog_cache
+from app.backend.config import IMPORT_MAX_BYTES, SQL_PROFILE, UPLOAD_FOLDER
+from app.backend.uploads import MULTIPART_OVERHEAD, UploadLimitMiddleware
+from app.backend.static import MediaFiles
+from app.backend.db import engine, replica_engine, pool_stats
+from app.routers.auth import token_cache
+from app.backend.outbox import outbox_worker
+from app.backend.metrics import MetricsMiddleware, exporter, metrics
+from app.backend.sql_profiler import SQLProfilerMiddleware
+from app.backend.warmup import warmup
+from app.backend.invalidation import InvalidationListener
+from app.backend.compression import CompressionMiddleware
+from app.backend.admission import admission
+
+
+# Изменения каталога в других воркерах сбрасывают снимок этого процесса
+invalidation_listener = InvalidationListener(catalog_cache.invalidate)
+
+# Отказы контроля допуска попадают в /metrics
+metrics.collectors.append(admission.render)
 
-app = FastAPI()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Прогрев идёт в фоне: /healthz отвечает сразу, /readyz — после прогрева
+    warmup.start()
+    invalidation_listener.start()
+    outbox_worker.start()
+    exporter.start()
+    yield
+    await warmup.stop()
+    await invalidation_listener.stop()
+    await outbox_worker.stop()
+    await exporter.stop()
 
+
+# orjson вместо стандартного json для всех ответов по умолчанию
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
+media = MediaFiles(directory=UPLOAD_FOLDER)
+
+# Ограничение размера загрузок до разбора multipart-тела; файлы импорта
+# каталога заметно больше картинок. Картинки товаров проверяются по первым байтам
+app.add_middleware(
+    UploadLimitMiddleware,
+    limits={
+        "/products/import": IMPORT_MAX_BYTES + MULTIPART_OVERHEAD,
+        "/category/import": IMPORT_MAX_BYTES + MULTIPART_OVERHEAD,
+    },
+    image_paths=(r"/products/create", r"/products/detail/[^/]+"),
+)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  # Разрешить все источники
@@ -13,16 +65,58 @@ app.add_middleware(
     allow_methods=["*"],  # Разрешить все методы (GET, POST, PUT и т.д.)
     allow_headers=["*"],  # Разрешить все заголовки
 )
+# Сжатие brotli/gzip; /static и предсжатый каталог не пережимаются
+app.add_middleware(CompressionMiddleware)
+if SQL_PROFILE:
+    app.add_middleware(SQLProfilerMiddleware)
+# Внешний слой: в замер попадает всё, включая отказы внутренних middleware
+app.add_middleware(MetricsMiddleware)
 
 
 @app.get("/")
 async def welcome() -> dict:
     return {"message": "pizza-catalog"}
 
-app.mount("/static", StaticFiles(directory="uploads"), name="static")
+
+@app.get("/healthz")
+async def healthz() -> dict:
+    # Процесс жив и цикл событий отвечает; БД здесь не проверяется
+    return {"status": "ok"}
+
+
+@app.get("/readyz")
+async def readyz():
+    if not warmup.ready:
+        return ORJSONResponse({"status": "warming up", **warmup.stats()}, status_code=503)
+    return {"status": "ready", **warmup.stats()}
+
+
+@app.get("/stats")
+async def stats() -> dict:
+    return {
+        "startup": warmup.stats(),
+        "catalog_cache": catalog_cache.stats(),
+        "invalidation": invalidation_listener.stats(),
+        "static": media.stats(),
+        "token_cache": token_cache.stats(),
+        "outbox": outbox_worker.stats(),
+        "admission": admission.stats(),
+        "db_pool": pool_stats(engine),
+        "db_replica_pool": pool_stats(replica_engine) if replica_engine is not engine else None,
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics() -> str:
+    # При нескольких воркерах — сумма по всем, а не метрики ответившего
+    return exporter.render()
+
+
+app.mount("/static", media, name="static")
 app.include_router(category.router)
 app.include_router(products.router)
 app.include_router(cart.router)
+warmup.import_seconds = time.perf_counter() - _import_started
 
 if __name__ == "__main__":
     import uvicorn
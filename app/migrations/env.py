@@ -1,4 +1,5 @@
-from app.models import category, products, cart
+from app.models import category, products, cart, orders, outbox
+from app.backend.config import DATABASE_URL
 from app.backend.db import Base
 import asyncio
 from logging.config import fileConfig
@@ -13,6 +14,9 @@ from alembic import context
 # access to the values within the .ini file in use.
 config = context.config
 
+# DSN берётся из окружения так же, как у приложения
+config.set_main_option("sqlalchemy.url", DATABASE_URL.replace("%", "%%"))
+
 # Interpret the config file for Python logging.
 # This line sets up loggers basically.
 if config.config_file_name is not None:
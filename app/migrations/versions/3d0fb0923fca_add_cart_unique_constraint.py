@@ -0,0 +1,52 @@
+"""Add unique constraint on cart items
+
+Revision ID: 3d0fb0923fca
+Revises: 42b9d7607cff
+Create Date: 2026-10-18 13:40:18.276430
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3d0fb0923fca'
+down_revision: Union[str, None] = '42b9d7607cff'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Строки без пользователя не принадлежат никому и недостижимы из API
+    op.execute("DELETE FROM carts WHERE user_id IS NULL")
+    # Дубли одной позиции схлопываем в самую раннюю строку с суммой количеств
+    op.execute(
+        """
+        UPDATE carts
+        SET quantity = dup.total
+        FROM (
+            SELECT min(id) AS keep_id, sum(quantity) AS total
+            FROM carts
+            GROUP BY user_id, product_id, radius
+            HAVING count(*) > 1
+        ) AS dup
+        WHERE carts.id = dup.keep_id
+        """
+    )
+    op.execute(
+        """
+        DELETE FROM carts
+        USING carts AS keep
+        WHERE carts.user_id = keep.user_id
+          AND carts.product_id = keep.product_id
+          AND carts.radius = keep.radius
+          AND carts.id > keep.id
+        """
+    )
+    op.create_unique_constraint('uq_carts_user_product_radius', 'carts', ['user_id', 'product_id', 'radius'])
+
+
+def downgrade() -> None:
+    op.drop_constraint('uq_carts_user_product_radius', 'carts', type_='unique')
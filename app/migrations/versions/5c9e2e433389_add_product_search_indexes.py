@@ -0,0 +1,31 @@
+"""Add product search indexes
+
+Revision ID: 5c9e2e433389
+Revises: fd690096561e
+Create Date: 2026-10-18 11:48:05.312774
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c9e2e433389'
+down_revision: Union[str, None] = 'fd690096561e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.create_index('ix_products_search_document', 'products', [sa.text("to_tsvector('simple', coalesce(name, '') || ' ' || coalesce(description, ''))")], unique=False, postgresql_using='gin', postgresql_where=sa.text('is_active'))
+    op.create_index('ix_products_name_trgm', 'products', ['name'], unique=False, postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}, postgresql_where=sa.text('is_active'))
+    op.create_index('ix_products_slug_trgm', 'products', ['slug'], unique=False, postgresql_using='gin', postgresql_ops={'slug': 'gin_trgm_ops'}, postgresql_where=sa.text('is_active'))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_products_slug_trgm', table_name='products', postgresql_using='gin', postgresql_where=sa.text('is_active'))
+    op.drop_index('ix_products_name_trgm', table_name='products', postgresql_using='gin', postgresql_where=sa.text('is_active'))
+    op.drop_index('ix_products_search_document', table_name='products', postgresql_using='gin', postgresql_where=sa.text('is_active'))
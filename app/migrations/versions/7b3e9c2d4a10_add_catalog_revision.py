@@ -0,0 +1,33 @@
+"""Add catalog_revision
+
+Revision ID: 7b3e9c2d4a10
+Revises: 1d561a4ea42b
+Create Date: 2026-10-18 21:40:37.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7b3e9c2d4a10'
+down_revision: Union[str, None] = '1d561a4ea42b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('catalog_revision',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('revision', sa.BigInteger(), server_default='1', nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    # Строка ревизии одна и должна существовать до первой записи в каталог
+    op.execute("INSERT INTO catalog_revision (id) VALUES (1)")
+
+
+def downgrade() -> None:
+    op.drop_table('catalog_revision')
@@ -0,0 +1,48 @@
+"""Add materialized category path
+
+Revision ID: e4a750c68234
+Revises: a5796bba5244
+Create Date: 2026-10-18 10:12:41.118305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4a750c68234'
+down_revision: Union[str, None] = 'a5796bba5244'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('categories', sa.Column('path', sa.String(collation='C'), nullable=True))
+    # Заполняем пути существующего дерева рекурсивным обходом от корней
+    op.execute(
+        """
+        WITH RECURSIVE tree (id, path) AS (
+            SELECT id, '/' || id::text || '/'
+            FROM categories
+            WHERE parent_id IS NULL
+            UNION ALL
+            SELECT c.id, t.path || c.id::text || '/'
+            FROM categories c
+            JOIN tree t ON c.parent_id = t.id
+        )
+        UPDATE categories
+        SET path = tree.path
+        FROM tree
+        WHERE categories.id = tree.id
+        """
+    )
+    op.create_index(op.f('ix_categories_path'), 'categories', ['path'], unique=False)
+    op.create_index(op.f('ix_products_category_id'), 'products', ['category_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_products_category_id'), table_name='products')
+    op.drop_index(op.f('ix_categories_path'), table_name='categories')
+    op.drop_column('categories', 'path')
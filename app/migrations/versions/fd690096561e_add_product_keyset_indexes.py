@@ -0,0 +1,32 @@
+"""Add product keyset pagination indexes
+
+Revision ID: fd690096561e
+Revises: e4a750c68234
+Create Date: 2026-10-18 11:03:27.540912
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'fd690096561e'
+down_revision: Union[str, None] = 'e4a750c68234'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_products_active_price_id', 'products', ['price', 'id'], unique=False, postgresql_where=sa.text('is_active'))
+    op.create_index('ix_products_active_rating_id', 'products', ['rating', 'id'], unique=False, postgresql_where=sa.text('is_active'))
+    op.create_index('ix_products_active_name_id', 'products', ['name', 'id'], unique=False, postgresql_where=sa.text('is_active'))
+    op.create_index('ix_products_active_category_id_id', 'products', ['category_id', 'id'], unique=False, postgresql_where=sa.text('is_active'))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_products_active_category_id_id', table_name='products', postgresql_where=sa.text('is_active'))
+    op.drop_index('ix_products_active_name_id', table_name='products', postgresql_where=sa.text('is_active'))
+    op.drop_index('ix_products_active_rating_id', table_name='products', postgresql_where=sa.text('is_active'))
+    op.drop_index('ix_products_active_price_id', table_name='products', postgresql_where=sa.text('is_active'))
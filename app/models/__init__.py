@@ -1,3 +1,6 @@
 from .category import Category
 from .products import Product
 from .cart import Cart
+from .orders import Order, OrderItem
+from .outbox import OutboxMessage
+from .revision import CatalogRevision
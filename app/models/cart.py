@@ -1,5 +1,5 @@
 from app.backend.db import Base
-from sqlalchemy import Column, ForeignKey, Integer, String, Float
+from sqlalchemy import Column, ForeignKey, Integer, String, Float, UniqueConstraint
 from sqlalchemy.orm import relationship
 from app.models import *
 
@@ -13,3 +13,7 @@ class Cart(Base):
     radius = Column(Float, index=True)
     quantity = Column(Integer, default=1)
     product = relationship("Product")
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "product_id", "radius", name="uq_carts_user_product_radius"),
+    )
@@ -1,5 +1,5 @@
 from app.backend.db import Base
-from sqlalchemy import Column, ForeignKey, Integer, String, Boolean
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, String, Boolean, and_, func
 from sqlalchemy.orm import relationship
 from app.models import *
 
@@ -12,5 +12,18 @@ class Category(Base):
     slug = Column(String, unique=True, index=True)
     is_active = Column(Boolean, default=True)
     parent_id = Column(Integer, ForeignKey("categories.id"), nullable=True)
+    # Материализованный путь от корня: "/<id корня>/.../<id>/".
+    # Побайтовая сортировка (COLLATE "C") позволяет выбирать поддерево
+    # диапазоном по индексу: path >= '/1/5/' AND path < '/1/5/~'
+    path = Column(String(collation="C"), index=True)
+    updated_at = Column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now(),
+        nullable=False, index=True,
+    )
 
     products = relationship("Product", back_populates="category")
+
+
+def in_subtree(path):
+    """Условие «категория лежит в поддереве с путём path» (включая корень)."""
+    return and_(Category.path >= path, Category.path < path + "~")
@@ -0,0 +1,29 @@
+from app.backend.db import Base
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, String, Float, func
+from sqlalchemy.orm import relationship
+from app.models import *
+
+
+class Order(Base):
+    __tablename__ = "orders"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(String, index=True)
+    total_price = Column(Integer)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    items = relationship("OrderItem", back_populates="order")
+
+
+class OrderItem(Base):
+    __tablename__ = "order_items"
+
+    # Название и цена копируются на момент оформления заказа
+    id = Column(Integer, primary_key=True, index=True)
+    order_id = Column(Integer, ForeignKey("orders.id"), index=True)
+    product_id = Column(Integer, ForeignKey("products.id"))
+    product_name = Column(String)
+    product_price = Column(Integer)
+    radius = Column(Float)
+    quantity = Column(Integer)
+    total_price = Column(Integer)
+    order = relationship("Order", back_populates="items")
@@ -0,0 +1,26 @@
+from app.backend.db import Base
+from sqlalchemy import Column, DateTime, Index, Integer, String, JSON, func
+from app.models import *
+
+
+class OutboxMessage(Base):
+    __tablename__ = "outbox"
+
+    # Сообщение пишется в той же транзакции, что и бизнес-изменение,
+    # а доставляется фоновым воркером (app.backend.outbox)
+    id = Column(Integer, primary_key=True, index=True)
+    topic = Column(String)
+    payload = Column(JSON)
+    status = Column(String, default="pending")
+    attempts = Column(Integer, default=0)
+    last_error = Column(String, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    available_at = Column(DateTime(timezone=True), server_default=func.now())
+    sent_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        Index(
+            "ix_outbox_pending_available_at", "available_at",
+            postgresql_where=status == "pending",
+        ),
+    )
@@ -1,5 +1,5 @@
 from app.backend.db import Base
-from sqlalchemy import Column, ForeignKey, Integer, String, Boolean, Float
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, String, Boolean, Float, Index, JSON, func, literal_column, text
 from sqlalchemy.orm import relationship
 from app.models import *
 
@@ -13,7 +13,54 @@ class Product(Base):
     description = Column(String)
     price = Column(Integer)
     image_url = Column(String)
-    category_id = Column(Integer, ForeignKey("categories.id"))
+    # Уменьшенные копии image_url: {"widths", "srcset" по mime-типам, "placeholder"}
+    image_variants = Column(JSON, nullable=True)
+    category_id = Column(Integer, ForeignKey("categories.id"), index=True)
     rating = Column(Float)
     is_active = Column(Boolean, default=True)
+    # Момент последнего изменения строки, по нему работает инкрементальный /products/feed
+    updated_at = Column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False
+    )
     category = relationship("Category", back_populates="products")
+
+    # Индексы под keyset-пагинацию списка активных товаров: по одному на
+    # каждую сортировку, id — добивающий ключ для однозначного порядка
+    __table_args__ = (
+        Index("ix_products_active_price_id", "price", "id", postgresql_where=is_active),
+        Index("ix_products_active_rating_id", "rating", "id", postgresql_where=is_active),
+        Index("ix_products_active_name_id", "name", "id", postgresql_where=is_active),
+        Index("ix_products_active_category_id_id", "category_id", "id", postgresql_where=is_active),
+        # Без условия is_active: инкрементальная выгрузка отдаёт и снятые с продажи
+        Index("ix_products_updated_at_id", "updated_at", "id"),
+        # Поиск: полнотекстовый индекс по названию и описанию и триграммные
+        # индексы (pg_trgm) по названию и slug — транслитерации названия
+        Index(
+            "ix_products_search_document",
+            text("to_tsvector('simple', coalesce(name, '') || ' ' || coalesce(description, ''))"),
+            postgresql_using="gin",
+            postgresql_where=is_active,
+        ),
+        Index(
+            "ix_products_name_trgm", "name",
+            postgresql_using="gin",
+            postgresql_ops={"name": "gin_trgm_ops"},
+            postgresql_where=is_active,
+        ),
+        Index(
+            "ix_products_slug_trgm", "slug",
+            postgresql_using="gin",
+            postgresql_ops={"slug": "gin_trgm_ops"},
+            postgresql_where=is_active,
+        ),
+    )
+
+
+# Выражение должно совпадать с ix_products_search_document, иначе Postgres
+# не применит индекс; константы поэтому не передаются параметрами
+search_document = func.to_tsvector(
+    literal_column("'simple'"),
+    func.coalesce(Product.name, literal_column("''"))
+    .concat(literal_column("' '"))
+    .concat(func.coalesce(Product.description, literal_column("''"))),
+)
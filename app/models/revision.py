@@ -0,0 +1,13 @@
+from app.backend.db import Base
+from sqlalchemy import BigInteger, Column, DateTime, Integer, func
+
+
+class CatalogRevision(Base):
+    __tablename__ = "catalog_revision"
+
+    # Единственная строка (id = 1): ревизия каталога, общая для всех воркеров.
+    # Каждая запись в каталог увеличивает её в своей транзакции, а из неё
+    # строятся ETag и Last-Modified
+    id = Column(Integer, primary_key=True)
+    revision = Column(BigInteger, nullable=False, server_default="1")
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
@@ -1,10 +1,13 @@
+import hashlib
+import time
+from collections import OrderedDict
 from jose import jwt, JWTError
 from jose import jwt
-from datetime import datetime
 from fastapi.security import OAuth2PasswordBearer
 from fastapi import APIRouter, Depends, status, HTTPException
 from typing import Annotated
 from passlib.context import CryptContext
+from app.backend.config import TOKEN_CACHE_SIZE
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 bcrypt_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -15,7 +18,59 @@ SECRET_KEY = "1f1e92bade502438c1789b443955912dfbc19a1cfde28fdf4612acf13a194f87"
 ALGORITHM = "HS256"
 
 
+class VerifiedTokenCache:
+    """LRU уже проверенных токенов: sha256 токена -> (данные пользователя, exp).
+
+    Запись действительна ровно до exp токена, поэтому повторные запросы
+    с тем же токеном не декодируют и не проверяют подпись заново.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[bytes, tuple[dict, float]] = OrderedDict()
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str) -> dict | None:
+        key = self._key(token)
+        entry = self._entries.get(key)
+        if entry is not None and time.time() < entry[1]:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+        if entry is not None:
+            del self._entries[key]
+        self.misses += 1
+        return None
+
+    def put(self, token: str, user: dict, expire: float) -> None:
+        self._entries[self._key(token)] = (user, expire)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+token_cache = VerifiedTokenCache(TOKEN_CACHE_SIZE)
+
+
 async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)]):
+    user = token_cache.get(token)
+    if user is not None:
+        return dict(user)
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id: int = payload.get("id")
@@ -33,17 +88,21 @@ async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)]):
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="No access token supplied",
             )
-        if datetime.now() > datetime.fromtimestamp(expire):
+        if time.time() > expire:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN, detail="Token expired!"
             )
 
-        return {
+        user = {
             "id": user_id,
             "first_name": first_name,
             "last_name": last_name,
             "is_admin": is_admin,
+            # Адрес для письма о заказе (outbox)
+            "email": payload.get("email"),
         }
+        token_cache.put(token, user, expire)
+        return dict(user)
     except JWTError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Could not validate user"
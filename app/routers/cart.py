@@ -1,6 +1,11 @@
+import logging
+
 from slugify import slugify
-from app.schemas import CreateCart
-from sqlalchemy import insert, select, update, delete
+from collections import defaultdict
+from app.schemas import BatchCart, BatchCartOut, CartOut, CreateCart
+from sqlalchemy import select, update, delete, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
 from app.models import *
 from typing import Annotated
 from app.backend.db_depends import get_db
@@ -8,102 +13,193 @@ from sqlalchemy.orm import Session
 from fastapi import APIRouter, Depends, status, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.routers.auth import get_current_user
+from app.backend.notifications import build_order_email
+from app.backend.outbox import outbox_worker
+from app.backend.admission import admission
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/cart", tags=["cart"])
 
+# Запись корзины и оформление заказа проходят контроль допуска
+admit_cart = Depends(admission.dependency("cart"))
+admit_checkout = Depends(admission.dependency("checkout"))
+
+# Предел количества в одной строке корзины: сумма с новой дельтой не
+# переполняет int4
+MAX_LINE_QUANTITY = 10_000
+
+
+def _user_id(get_user: dict) -> str:
+    # carts.user_id — строка, а в токене id пользователя лежит под ключом "id"
+    return str(get_user.get("id"))
+
+
+async def _cart_lines(db: AsyncSession, user_id) -> tuple[list[dict], int]:
+    """Строки корзины с данными товара, суммой по строке и итогом корзины.
+
+    Один запрос: корзина соединяется с товарами, а общая сумма считается
+    оконной функцией, поэтому число обращений к БД не зависит от размера
+    корзины.
+    """
+    line_total = (Product.price * Cart.quantity).label("total_price")
+    rows = await db.execute(
+        select(
+            Cart.product_id,
+            Product.name.label("product_name"),
+            Product.price.label("product_price"),
+            Cart.radius,
+            Cart.quantity,
+            line_total,
+            Product.image_url,
+            func.sum(Product.price * Cart.quantity).over().label("cart_total"),
+        )
+        .join(Product, Product.id == Cart.product_id)
+        .where(Cart.user_id == user_id)
+        .order_by(Cart.id)
+    )
+
+    lines = []
+    cart_total = 0
+    for row in rows.mappings():
+        line = dict(row)
+        cart_total = line.pop("cart_total") or 0
+        lines.append(line)
+    return lines, cart_total
 
-@router.post("/update")
+
+@router.post("/update", dependencies=[admit_cart])
 async def update_cart(
     db: Annotated[AsyncSession, Depends(get_db)],
     create_cart: CreateCart,
     get_user: Annotated[dict, Depends(get_current_user)],
 ):
-    # Проверка существования продукта
-    product = await db.scalar(select(Product).where(Product.id == create_cart.product_id))
-    if not product:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Product not found"
-        )
-
-    # Проверяем, есть ли такой товар с указанным радиусом в корзине пользователя
-    cart_item = await db.scalar(
-        select(Cart).where(
-            Cart.user_id == get_user.get("user_id"),
-            Cart.product_id == create_cart.product_id,
-            Cart.radius == create_cart.radius
-        )
+    user_id = _user_id(get_user)
+    item = (
+        Cart.user_id == user_id,
+        Cart.product_id == create_cart.product_id,
+        Cart.radius == create_cart.radius,
     )
 
-    if not cart_item:
-        # Если товара нет в корзине, а запрос на уменьшение, возвращаем ошибку
-        if create_cart.quantity == "-":
+    if create_cart.quantity == "+":
+        # Добавление или увеличение количества одним выражением;
+        # уникальный ключ исключает дубли при одновременных нажатиях
+        try:
+            quantity = await db.scalar(
+                insert(Cart)
+                .values(
+                    user_id=user_id,
+                    product_id=create_cart.product_id,
+                    radius=create_cart.radius,
+                    quantity=1,
+                )
+                .on_conflict_do_update(
+                    constraint="uq_carts_user_product_radius",
+                    set_={"quantity": func.least(Cart.quantity + 1, MAX_LINE_QUANTITY)},
+                )
+                .returning(Cart.quantity)
+            )
+        except IntegrityError:
+            # Нарушен внешний ключ: такого продукта нет
+            await db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Product not found"
+            )
+    else:
+        # Уменьшение под блокировкой строки: параллельное уменьшение ждёт
+        # и видит уже новое количество. Строку, дошедшую до нуля, удаляем
+        # в той же транзакции, как и в /cart/batch
+        quantity = await db.scalar(
+            update(Cart)
+            .where(*item)
+            .values(quantity=Cart.quantity - 1)
+            .returning(Cart.quantity)
+        )
+        if quantity is None:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Cannot decrease quantity. Item not in cart."
             )
-        # Если товара нет, добавляем его в корзину с начальным количеством 1
-        await db.execute(
-            insert(Cart).values(
-                user_id=get_user.get("user_id"),
-                product_id=create_cart.product_id,
-                radius=create_cart.radius
-            )
-        )
-    else:
-        # Если товар найден, изменяем его количество
-        new_quantity = cart_item.quantity + \
-            (1 if create_cart.quantity == "+" else -1)
+        if quantity < 1:
+            await db.execute(delete(Cart).where(*item, Cart.quantity < 1))
+            quantity = 0
+    await db.commit()
+    return {
+        "status_code": status.HTTP_200_OK,
+        "message": "Cart updated successfully",
+        "quantity": quantity,
+    }
 
-        if new_quantity < 1:
+
+@router.post("/batch", response_model=BatchCartOut, dependencies=[admit_cart])
+async def batch_update_cart(
+    db: Annotated[AsyncSession, Depends(get_db)],
+    batch: BatchCart,
+    get_user: Annotated[dict, Depends(get_current_user)],
+):
+    user_id = _user_id(get_user)
+
+    # Операции над одной позицией схлопываем: важна только итоговая дельта,
+    # к тому же ON CONFLICT не может изменить одну строку дважды
+    deltas = defaultdict(int)
+    for operation in batch.operations:
+        deltas[(operation.product_id, operation.radius)] += operation.delta
+    # Строки блокируются в порядке (product_id, radius): два параллельных
+    # пакета одного пользователя не захватят их навстречу друг другу
+    rows = [
+        {
+            "user_id": user_id,
+            "product_id": product_id,
+            "radius": radius,
+            "quantity": min(delta, MAX_LINE_QUANTITY),
+        }
+        for (product_id, radius), delta in sorted(deltas.items())
+        if delta
+    ]
+
+    if rows:
+        # Все изменения — один многострочный upsert в одной транзакции
+        statement = insert(Cart).values(rows)
+        try:
             await db.execute(
-                delete(Cart).where(Cart.id == cart_item.id)
+                statement.on_conflict_do_update(
+                    constraint="uq_carts_user_product_radius",
+                    set_={
+                        "quantity": func.least(
+                            Cart.quantity + statement.excluded.quantity, MAX_LINE_QUANTITY
+                        )
+                    },
+                )
             )
-        else:
-            await db.execute(
-                update(Cart)
-                .where(Cart.id == cart_item.id)
-                .values(quantity=new_quantity)
+        except IntegrityError:
+            await db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Product not found"
             )
+        # Позиции, количество которых опустилось до нуля и ниже, удаляем
+        await db.execute(
+            delete(Cart).where(Cart.user_id == user_id, Cart.quantity < 1)
+        )
+
+    cart, total_price = await _cart_lines(db, user_id)
     await db.commit()
-    return {"status_code": status.HTTP_200_OK, "message": "Cart updated successfully"}
+    return {"status_code": status.HTTP_200_OK, "cart": cart, "total_price": total_price}
 
 
-@router.get("/get")
+@router.get("/get", response_model=CartOut)
 async def get_cart(
     db: Annotated[AsyncSession, Depends(get_db)],
     get_user: Annotated[dict, Depends(get_current_user)],
 ):
-    # Получаем корзину пользователя
-    cart_items = await db.scalars(
-        select(Cart).where(Cart.user_id == get_user.get("user_id"))
-    )
-
-    if not cart_items:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Cart is empty"
-        )
-
-    result = []
-    for item in cart_items:
-        product = await db.scalar(select(Product).where(Product.id == item.product_id))
-        if not product:
-            continue
-        result.append({
-            "product_id": item.product_id,
-            "product_name": product.name,
-            "product_price": product.price,
-            "radius": item.radius,
-            "quantity": item.quantity,
-            "total_price": product.price * item.quantity,
-            "image_url": product.image_url,
-        })
+    # Получаем корзину пользователя вместе с товарами одним запросом
+    result, _ = await _cart_lines(db, _user_id(get_user))
 
     return {"status_code": status.HTTP_200_OK, "cart": result}
 
 
-@router.delete("/delete/{product_id}/{radius}")
+@router.delete("/delete/{product_id}/{radius}", dependencies=[admit_cart])
 async def delete_product_from_cart(
     product_id: int,
     radius: float,
@@ -113,7 +209,7 @@ async def delete_product_from_cart(
 
     cart_item = await db.scalar(
         select(Cart).where(
-            Cart.user_id == get_user.get("user_id"),
+            Cart.user_id == _user_id(get_user),
             Cart.product_id == product_id,
             Cart.radius == radius
         )
@@ -135,90 +231,122 @@ async def delete_product_from_cart(
     return {"status_code": status.HTTP_200_OK, "message": "Product removed from cart"}
 
 
-@router.post("/checkout")
+@router.post("/checkout", dependencies=[admit_checkout])
 async def checkout_cart(
     db: Annotated[AsyncSession, Depends(get_db)],
     get_user: Annotated[dict, Depends(get_current_user)],
 ):
-    # Получаем все товары из корзины текущего пользователя
-    cart_items = await db.scalars(
-        select(Cart).where(Cart.user_id == get_user.get("user_id"))
+    user_id = _user_id(get_user)
+
+    # Заказ собирается из строк, которые удалил DELETE ... RETURNING: в заказ
+    # попадает ровно то, что убрано из корзины. Позиции, добавленные позже,
+    # остаются в корзине, а повторное оформление ждёт блокировки строк
+    # и получает пустую корзину. Запрос строится на Core-таблицах: ORM-вариант
+    # DELETE не выводит столбцы products в RETURNING
+    carts, products = Cart.__table__.c, Product.__table__.c
+    removed = await db.execute(
+        delete(Cart.__table__)
+        .where(carts.user_id == user_id, carts.product_id == products.id)
+        .returning(
+            carts.id,
+            carts.product_id,
+            products.name.label("product_name"),
+            products.price.label("product_price"),
+            carts.radius,
+            carts.quantity,
+            (products.price * carts.quantity).label("total_price"),
+            products.image_url,
+        )
     )
+    cart_summary = []
+    for row in sorted(removed.mappings(), key=lambda row: row["id"]):
+        line = dict(row)
+        del line["id"]
+        cart_summary.append(line)
 
-    if not cart_items:
+    if not cart_summary:
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Cart is empty"
         )
-
-    # Формируем данные о корзине и рассчитываем общую сумму
-    cart_summary = []
-    total_price = 0
-    for item in cart_items:
-        product = await db.scalar(select(Product).where(Product.id == item.product_id))
-        if not product:
-            continue
-        item_data = {
-            "product_id": item.product_id,
-            "product_name": product.name,
-            "product_price": product.price,
-            "radius": item.radius,
-            "quantity": item.quantity,
-            "total_price": product.price * item.quantity,
-            "image_url": product.image_url,
-        }
-        total_price += item_data["total_price"]
-        cart_summary.append(item_data)
+    # Старые строки могут быть без цены или количества: такой заказ не оформляем,
+    # откат возвращает позиции в корзину
+    unpriced = [item["product_id"] for item in cart_summary if item["total_price"] is None]
+    if unpriced:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Products without a price in the cart: {unpriced}",
+        )
+    total_price = sum(item["total_price"] for item in cart_summary)
 
     # Формируем тело письма
-    email_subject = "Ваш заказ успешно оформлен"
-    email_body = (
-        f"Здравствуйте, {get_user.get('first_name')}!\n\n"
-        "Ваш заказ был успешно оформлен. Подробности:\n\n"
-        + "\n".join(
-            [
-                f"{item['quantity']}x {item['product_name']
-                                       } ({item['radius']} см) - {item['total_price']} руб."
-                for item in cart_summary
-            ]
-        )
-        + f"\n\nОбщая сумма: {total_price} руб.\n\nСпасибо за заказ!"
+    email_subject, email_body = build_order_email(
+        get_user.get("first_name"), cart_summary, total_price
     )
 
-    # Комментарий для реальной отправки email
-    # await send_email(to=EmailStr(user_email), subject=email_subject, body=email_body)
-
-    # Удаляем товары из корзины по их ID
+    # Заказ, его позиции с ценами на момент оформления, письмо в outbox
+    # и удаление строк корзины — одна транзакция. Письмо отправит фоновый
+    # воркер, поэтому время ответа не зависит от почтового сервера
     try:
-        cart_ids = [item.id for item in cart_items]
-        if cart_ids:
-            # Используем ORM для удаления элементов
-            await db.execute(delete(Cart).where(Cart.id.in_(cart_ids)))
-            await db.commit()
-        else:
-            raise HTTPException(status_code=404, detail="No items in the cart")
-    except Exception as e:
-        # Логируем и выводим ошибку
-        print("Error while deleting items from the cart:", e)
+        order_id = await db.scalar(
+            insert(Order)
+            .values(user_id=user_id, total_price=total_price)
+            .returning(Order.id)
+        )
+        await db.execute(
+            insert(OrderItem),
+            [
+                {
+                    "order_id": order_id,
+                    "product_id": item["product_id"],
+                    "product_name": item["product_name"],
+                    "product_price": item["product_price"],
+                    "radius": item["radius"],
+                    "quantity": item["quantity"],
+                    "total_price": item["total_price"],
+                }
+                for item in cart_summary
+            ],
+        )
+        await db.execute(
+            insert(OutboxMessage).values(
+                topic="order_confirmation_email",
+                payload={
+                    "order_id": order_id,
+                    "to": get_user.get("email"),
+                    "subject": email_subject,
+                    "body": email_body,
+                },
+            )
+        )
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        logger.exception("Failed to place order for user %s", user_id)
         raise HTTPException(
-            status_code=500, detail=f"Failed to delete items from cart: {str(e)}"
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to place order",
         )
+    outbox_worker.wake()
 
     # Возвращаем успешный ответ
     return {
         "status_code": status.HTTP_200_OK,
         "message": "Order placed successfully",
+        "order_id": order_id,
         "email_subject": email_subject,
         "email_body": email_body
     }
 
 
-@router.delete("/clear")
+@router.delete("/clear", dependencies=[admit_cart])
 async def clear_cart(
     db: Annotated[AsyncSession, Depends(get_db)],
     get_user: Annotated[dict, Depends(get_current_user)],
 ):
-    user_id = get_user.get("user_id")  # Получаем ID текущего пользователя
+    user_id = _user_id(get_user)  # Получаем ID текущего пользователя
 
     # Ищем товары в корзине этого пользователя
     cart_items = await db.scalars(
@@ -1,21 +1,66 @@
 from slugify import slugify
-from app.schemas import CreateCategory
-from sqlalchemy import insert, select, update
+from app.schemas import CategoryOut, CreateCategory
+from sqlalchemy import insert, select, update, func, or_, String
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from app.models import *
+from app.models.category import in_subtree
 from typing import Annotated
 from app.backend.db_depends import get_db
 from sqlalchemy.orm import Session
-from fastapi import APIRouter, Depends, status, HTTPException
+from fastapi import APIRouter, Depends, File, Request, Response, UploadFile, status, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.routers.auth import get_current_user
+from app.backend.catalog_cache import catalog_cache
+from app.backend.conditional import catalog_conditional_get, snapshot_response
+from app.backend.bulk import MAX_REPORTED_ERRORS, batched, dedupe_by_slug, id_refs, iter_records
 
 router = APIRouter(prefix="/category", tags=["category"])
 
 
-@router.get("/all_categories")
-async def get_all_categories(db: Annotated[AsyncSession, Depends(get_db)]):
-    categories = await db.scalars(select(Category).where(Category.is_active == True))
-    return categories.all()
+@router.get(
+    "/all_categories",
+    response_model=list[CategoryOut],
+    dependencies=[Depends(catalog_conditional_get)],
+)
+async def get_all_categories(
+    db: Annotated[AsyncSession, Depends(get_db)], request: Request, response: Response
+):
+    snapshot = await catalog_cache.get(db)
+    return snapshot_response(snapshot, "categories", request, response)
+
+
+def _path_ids(path: str | None) -> set[int]:
+    return {int(part) for part in (path or "").split("/") if part}
+
+
+async def _lock_branches(db: AsyncSession, *category_ids: int) -> dict[int, Category]:
+    """Блокирует (FOR UPDATE) категории вместе со всеми предками и возвращает
+    их свежие версии.
+
+    Перенос поддерева блокирует переносимую категорию и её предков, поэтому
+    он не идёт параллельно с записью, опирающейся на путь кого-то из
+    потомков: одна транзакция ждёт другую и затем читает уже
+    зафиксированные пути.
+    """
+    locked: dict[int, Category] = {}
+    wanted = set(category_ids)
+    while wanted - locked.keys():
+        rows = (await db.scalars(
+            select(Category)
+            .where(Category.id.in_(wanted - locked.keys()))
+            .order_by(Category.id)
+            .with_for_update()
+            .execution_options(populate_existing=True)
+        )).all()
+        if not rows:
+            # Оставшихся id нет в базе
+            break
+        for row in rows:
+            locked[row.id] = row
+        # Предки — по путям, прочитанным уже под блокировкой
+        for row in rows:
+            wanted |= _path_ids(row.path)
+    return locked
 
 
 @router.post("/create")
@@ -26,16 +71,29 @@ async def create_category(
 ):
     if get_user.get("is_admin"):
         # Убедитесь, что parent_id равен None, если нет родительской категории
-        parent_id = create_category.parent_id if create_category.parent_id and await db.get(Category, create_category.parent_id) else None
+        parent = None
+        if create_category.parent_id:
+            locked = await _lock_branches(db, create_category.parent_id)
+            parent = locked.get(create_category.parent_id)
 
-        await db.execute(
-            insert(Category).values(
+        category_id = await db.scalar(
+            insert(Category)
+            .values(
                 name=create_category.name,
-                parent_id=parent_id,
+                parent_id=parent.id if parent else None,
                 slug=slugify(create_category.name),
             )
+            .returning(Category.id)
         )
+        # Путь строится от пути родителя, id известен только после вставки
+        await db.execute(
+            update(Category)
+            .where(Category.id == category_id)
+            .values(path=f"{parent.path if parent else '/'}{category_id}/")
+        )
+        await catalog_cache.bump(db)
         await db.commit()
+        await catalog_cache.refresh(db)
         return {"status_code": status.HTTP_201_CREATED, "transaction": "Successful"}
     else:
         raise HTTPException(
@@ -44,6 +102,118 @@ async def create_category(
         )
 
 
+async def _resolve_parents(
+    db: AsyncSession, refs: set[str], known: dict[str, tuple[int, str]]
+) -> None:
+    """Дописывает в known (id, path) родителей по ссылкам (id или slug) одним запросом."""
+    missing = refs - known.keys()
+    if not missing:
+        return
+    ids = id_refs(missing)
+    rows = await db.execute(
+        select(Category.id, Category.slug).where(
+            or_(Category.id.in_(ids), Category.slug.in_(missing))
+        )
+    )
+    slugs = dict(rows.all())
+    # Пути родителей читаются под блокировкой до конца импорта
+    locked = await _lock_branches(db, *slugs)
+    for category_id, slug in slugs.items():
+        if category_id in locked:
+            known[str(category_id)] = known[slug] = (category_id, locked[category_id].path)
+
+
+@router.post("/import")
+async def import_categories(
+    db: Annotated[AsyncSession, Depends(get_db)],
+    get_user: Annotated[dict, Depends(get_current_user)],
+    file: UploadFile = File(...),
+):
+    """Импорт категорий из CSV или NDJSON: name и необязательный parent (id или slug).
+
+    Родитель должен быть в базе, в той же пачке или выше по файлу. Для уже
+    существующих slug обновляется только название; перенос в другую ветку —
+    через update_category.
+    """
+    if not get_user.get("is_admin"):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="You must be admin user for this",
+        )
+
+    rows_total = inserted = updated = 0
+    errors = []
+    known: dict[str, tuple[int, str]] = {}
+    async for batch in batched(iter_records(file)):
+        rows_total += len(batch)
+        parsed = []
+        for row, record, error in batch:
+            if error is None:
+                name = str(record.get("name") or "").strip()
+                if not name or not slugify(name):
+                    error = "name is required"
+                else:
+                    parent = str(record.get("parent") or record.get("parent_id") or "").strip()
+                    parsed.append({"row": row, "name": name, "slug": slugify(name), "parent": parent})
+            if error is not None:
+                errors.append({"row": row, "error": error})
+
+        pending = dedupe_by_slug(parsed, errors)
+        await _resolve_parents(db, {item["parent"] for item in pending if item["parent"]}, known)
+        # Волнами: сначала строки с известным родителем, затем их дети из той же пачки
+        while pending:
+            ready = [item for item in pending if not item["parent"] or item["parent"] in known]
+            if not ready:
+                break
+            pending = [item for item in pending if item["parent"] and item["parent"] not in known]
+
+            stmt = pg_insert(Category).values([
+                {
+                    "name": item["name"],
+                    "slug": item["slug"],
+                    "parent_id": known[item["parent"]][0] if item["parent"] else None,
+                }
+                for item in ready
+            ])
+            rows = await db.execute(
+                stmt.on_conflict_do_update(
+                    index_elements=[Category.slug],
+                    set_={"name": stmt.excluded.name, "updated_at": func.now()},
+                ).returning(Category.id, Category.slug, Category.path)
+            )
+            parents = {item["slug"]: item["parent"] for item in ready}
+            paths = []
+            for category_id, slug, path in rows:
+                if path is None:
+                    # Новая категория: путь строится от пути родителя
+                    parent = parents[slug]
+                    path = f"{known[parent][1] if parent else '/'}{category_id}/"
+                    paths.append({"id": category_id, "path": path})
+                known[str(category_id)] = known[slug] = (category_id, path)
+            if paths:
+                await db.execute(update(Category), paths)
+            inserted += len(paths)
+            updated += len(ready) - len(paths)
+
+        for item in pending:
+            errors.append({"row": item["row"], "error": f"Unknown parent category {item['parent']!r}"})
+
+    if inserted or updated:
+        await catalog_cache.bump(db)
+    await db.commit()
+    if inserted or updated:
+        await catalog_cache.refresh(db)
+    errors.sort(key=lambda error: error["row"])
+    return {
+        "status_code": status.HTTP_200_OK,
+        "rows": rows_total,
+        "inserted": inserted,
+        "updated": updated,
+        "failed": len(errors),
+        "errors": errors[:MAX_REPORTED_ERRORS],
+    }
+
+
 @router.put("/update_category/{category_id}")
 async def update_category(
     category_id: int,
@@ -52,8 +222,13 @@ async def update_category(
     get_user: Annotated[dict, Depends(get_current_user)],
 ):
     if get_user.get("is_admin"):
-        # Retrieve the existing category
-        category = await db.scalar(select(Category).where(Category.id == category_id))
+        # Retrieve the existing category. Переносимая категория, новый родитель
+        # и их предки блокируются, поэтому пути и проверка на цикл ниже —
+        # по зафиксированным данным
+        locked = await _lock_branches(
+            db, category_id, *([update_category.parent_id] if update_category.parent_id else [])
+        )
+        category = locked.get(category_id)
         if category is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -61,24 +236,47 @@ async def update_category(
             )
 
         # Ensure that the parent_id is valid if provided
-        if update_category.parent_id and not await db.get(Category, update_category.parent_id):
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Invalid parent category ID",
-            )
+        parent = None
+        if update_category.parent_id:
+            parent = locked.get(update_category.parent_id)
+            if parent is None:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Invalid parent category ID",
+                )
+            if parent.path.startswith(category.path):
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Category cannot be moved into its own subtree",
+                )
 
         # Update the category
+        old_path = category.path
+        new_path = f"{parent.path if parent else '/'}{category.id}/"
         await db.execute(
             update(Category)
             .where(Category.id == category_id)
             .values(
                 name=update_category.name,
                 slug=slugify(update_category.name),
-                parent_id=update_category.parent_id if update_category.parent_id else None,
+                parent_id=parent.id if parent else None,
             )
         )
 
+        # On re-parenting rewrite the path prefix of the whole subtree
+        if new_path != old_path:
+            await db.execute(
+                update(Category)
+                .where(in_subtree(old_path))
+                .values(
+                    path=new_path
+                    + func.substr(Category.path, len(old_path) + 1, type_=String)
+                )
+            )
+
+        await catalog_cache.bump(db)
         await db.commit()
+        await catalog_cache.refresh(db)
         return {
             "status_code": status.HTTP_200_OK,
             "transaction": "Category update is successful",
@@ -107,7 +305,9 @@ async def delete_category(
             update(Category).where(Category.id ==
                                    category_id).values(is_active=False)
         )
+        await catalog_cache.bump(db)
         await db.commit()
+        await catalog_cache.refresh(db)
         return {
             "status_code": status.HTTP_200_OK,
             "transaction": "Category delete is successful",
@@ -1,37 +1,142 @@
 from fastapi import Form
-import uuid
-from pathlib import Path
-import shutil
+from fastapi.responses import StreamingResponse
 from app.models import Product
 from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.future import select
-from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, status
-from typing import Annotated
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Query, Request, Response, status
+from datetime import datetime, timedelta
+from typing import Annotated, Literal
+from sqlalchemy.orm import Session, aliased
 from app.backend.db_depends import get_db
-from app.schemas import CreateProduct
+from app.schemas import CreateProduct, ProductOut, ProductPage, ProductSearchPage
 from slugify import slugify
 from app.models import *
-from sqlalchemy import insert, select, update
+from app.models.category import in_subtree
+from app.models.products import search_document
+from sqlalchemy import insert, select, update, tuple_, func, or_, literal_column, case
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.routers.auth import get_current_user
+from app.backend.catalog_cache import catalog_cache
+from app.backend.config import FEED_SAFETY_LAG
+from app.backend.conditional import catalog_conditional_get, snapshot_response
+from app.backend.pagination import decode_cursor, encode_cursor
+from app.backend.images import schedule_variants
+from app.backend.uploads import store_upload
+from app.backend.bulk import (
+    MAX_INT4, MAX_REPORTED_ERRORS, batched, dedupe_by_slug, id_refs, iter_records,
+    parse_bool, stream_csv, stream_ndjson,
+)
 
 router = APIRouter(prefix="/products", tags=["products"])
 
 
-UPLOAD_FOLDER = "uploads"
+# Поддерживаемые сортировки списка товаров; "-" означает по убыванию.
+# Каждой соответствует частичный индекс (<колонка>, id) WHERE is_active
+SORT_COLUMNS = {
+    "id": Product.id,
+    "price": Product.price,
+    "rating": Product.rating,
+    "name": Product.name,
+}
+ProductSort = Literal["id", "-id", "price", "-price", "rating", "-rating", "name", "-name"]
 
 
-@router.get("/")
-async def all_products(db: Annotated[AsyncSession, Depends(get_db)]):
-    products = await db.scalars(
-        select(Product).filter(Product.is_active == True)
-    )
-    if products is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="There are no products"
+def _is_int4(value) -> bool:
+    return type(value) is int and -MAX_INT4 - 1 <= value <= MAX_INT4
+
+
+# Проверка значения сортировки из курсора: подделанный курсор не должен
+# доходить до asyncpg, который на чужом типе упадёт с 500
+SORT_CURSOR_CHECKS = {
+    "id": _is_int4,
+    "price": _is_int4,
+    "rating": lambda value: type(value) is float or _is_int4(value),
+    "name": lambda value: isinstance(value, str),
+}
+
+
+@router.get(
+    "/",
+    response_model=list[ProductOut] | ProductPage,
+    dependencies=[Depends(catalog_conditional_get)],
+)
+async def all_products(
+    db: Annotated[AsyncSession, Depends(get_db)],
+    request: Request,
+    response: Response,
+    limit: Annotated[int | None, Query(ge=1, le=100)] = None,
+    cursor: str | None = None,
+    category: int | None = None,
+    # price — Integer: дробная граница обрезалась бы при передаче в int4
+    min_price: Annotated[int | None, Query(ge=0, le=MAX_INT4)] = None,
+    max_price: Annotated[int | None, Query(ge=0, le=MAX_INT4)] = None,
+    min_rating: float | None = None,
+    sort: ProductSort = "id",
+):
+    # Без параметров отдаём полный список из снимка каталога, как раньше,
+    # уже сериализованным при сборке снимка
+    if (
+        limit is None and cursor is None and category is None
+        and min_price is None and max_price is None and min_rating is None
+        and sort == "id"
+    ):
+        snapshot = await catalog_cache.get(db)
+        return snapshot_response(snapshot, "products", request, response)
+
+    limit = limit or 20
+    column = SORT_COLUMNS[sort.lstrip("-")]
+    descending = sort.startswith("-")
+
+    query = select(*Product.__table__.columns).where(Product.is_active == True)
+    if category is not None:
+        root = aliased(Category)
+        root_path = select(root.path).where(root.id == category).scalar_subquery()
+        query = query.where(
+            Product.category_id.in_(select(Category.id).where(in_subtree(root_path)))
+        )
+    if min_price is not None:
+        query = query.where(Product.price >= min_price)
+    if max_price is not None:
+        query = query.where(Product.price <= max_price)
+    if min_rating is not None:
+        query = query.where(Product.rating >= min_rating)
+
+    # Keyset: продолжаем строго после (значение сортировки, id) последней строки,
+    # поэтому любая страница — это один проход по индексу без OFFSET
+    if column is Product.id:
+        key = Product.id
+        order_by = [Product.id.desc() if descending else Product.id]
+    else:
+        query = query.where(column.is_not(None))
+        key = tuple_(column, Product.id)
+        order_by = (
+            [column.desc(), Product.id.desc()] if descending else [column, Product.id]
         )
-    return products.all()
+
+    if cursor is not None:
+        position = decode_cursor(cursor)
+        if (
+            len(position) != 3 or position[0] != sort
+            or not SORT_CURSOR_CHECKS[sort.lstrip("-")](position[1])
+            or not _is_int4(position[2])
+        ):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Cursor does not match sort order",
+            )
+        last = position[2] if column is Product.id else tuple_(position[1], position[2])
+        query = query.where(key < last if descending else key > last)
+
+    rows = await db.execute(query.order_by(*order_by).limit(limit + 1))
+    items = [dict(row) for row in rows.mappings()]
+
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        last_item = items[-1]
+        next_cursor = encode_cursor([sort, last_item[column.key], last_item["id"]])
+    return {"items": items, "next_cursor": next_cursor}
 
 
 @router.post("/create")
@@ -50,20 +155,15 @@ async def create_product(
             detail="You are not authorized to use this method",
         )
 
-    # Генерируем уникальное имя для файла
-    unique_filename = f"{uuid.uuid4()}-{file.filename}"
-    file_location = Path(UPLOAD_FOLDER) / unique_filename
-    file_location.parent.mkdir(parents=True, exist_ok=True)
-
-    # Сохраняем файл
-    with file_location.open("wb") as f:
-        shutil.copyfileobj(file.file, f)
-
-    image_url = f"/static/{unique_filename}"
+    # Сохраняем файл потоково; имя файла — хеш содержимого, поэтому
+    # повторная загрузка той же картинки не создаёт копию
+    file_location = await store_upload(file)
+    image_url = f"/static/{file_location.name}"
 
     # Добавляем продукт в базу данных
-    await db.execute(
-        insert(Product).values(
+    product_id = await db.scalar(
+        insert(Product)
+        .values(
             name=name,
             description=description,
             price=price,
@@ -72,40 +172,315 @@ async def create_product(
             rating=0.0,
             slug=slugify(name),
         )
+        .returning(Product.id)
     )
+    await catalog_cache.bump(db)
     await db.commit()
+    await catalog_cache.refresh(db)
+    # Уменьшенные копии готовятся в фоне и появятся в image_variants позже
+    schedule_variants(product_id, image_url, file_location)
     return {"status_code": status.HTTP_201_CREATED, "transaction": "Successful"}
 
 
-@router.get("/{category_slug}")
-async def product_by_category(
-    db: Annotated[AsyncSession, Depends(get_db)], category_slug: str
+def _parse_product(row: int, record: dict) -> dict:
+    name = str(record.get("name") or "").strip()
+    if not name:
+        raise ValueError("name is required")
+    slug = slugify(name)
+    if not slug:
+        raise ValueError(f"Cannot build slug from name {name!r}")
+    price = float(record.get("price"))
+    if price < 0 or price > MAX_INT4 or not price.is_integer():
+        raise ValueError(f"Invalid price {record.get('price')!r}")
+    category = str(record.get("category") or record.get("category_id") or "").strip()
+    if not category:
+        raise ValueError("category is required")
+    is_active = record.get("is_active")
+    return {
+        "row": row,
+        "name": name,
+        "slug": slug,
+        "description": str(record.get("description") or ""),
+        "price": int(price),
+        "category": category,
+        "image_url": record.get("image_url") or None,
+        "is_active": True if is_active in (None, "") else parse_bool(is_active),
+    }
+
+
+async def _resolve_categories(db: AsyncSession, refs: set[str], known: dict[str, int]) -> None:
+    """Дописывает в known id категорий по ссылкам (id или slug) одним запросом."""
+    missing = refs - known.keys()
+    if not missing:
+        return
+    ids = id_refs(missing)
+    rows = await db.execute(
+        select(Category.id, Category.slug).where(
+            or_(Category.id.in_(ids), Category.slug.in_(missing))
+        )
+    )
+    for category_id, slug in rows:
+        known[str(category_id)] = category_id
+        known[slug] = category_id
+
+
+@router.post("/import")
+async def import_products(
+    db: Annotated[AsyncSession, Depends(get_db)],
+    get_user: Annotated[dict, Depends(get_current_user)],
+    file: UploadFile = File(...),
 ):
-    category = await db.scalar(select(Category).where(Category.slug == category_slug))
-    if category is None:
+    """Импорт товаров из CSV или NDJSON: name, price, category (id или slug),
+    необязательные description, image_url, is_active.
+
+    Строки пишутся пачками через INSERT ... ON CONFLICT (slug) DO UPDATE,
+    поэтому повторный импорт обновляет существующие товары. Ошибочные строки
+    попадают в отчёт и не мешают остальным.
+    """
+    if not get_user.get("is_admin"):
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="Category not found"
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="You are not authorized to use this method",
+        )
+
+    rows_total = inserted = updated = 0
+    errors = []
+    categories: dict[str, int] = {}
+    async for batch in batched(iter_records(file)):
+        rows_total += len(batch)
+        parsed = []
+        for row, record, error in batch:
+            if error is None:
+                try:
+                    parsed.append(_parse_product(row, record))
+                except (TypeError, ValueError) as e:
+                    error = str(e)
+            if error is not None:
+                errors.append({"row": row, "error": error})
+
+        await _resolve_categories(db, {item["category"] for item in parsed}, categories)
+        values = []
+        for item in dedupe_by_slug(parsed, errors):
+            category_id = categories.get(item["category"])
+            if category_id is None:
+                errors.append({"row": item["row"], "error": f"Unknown category {item['category']!r}"})
+                continue
+            values.append({
+                "name": item["name"],
+                "slug": item["slug"],
+                "description": item["description"],
+                "price": item["price"],
+                "category_id": category_id,
+                "image_url": item["image_url"],
+                "is_active": item["is_active"],
+                "rating": 0.0,
+            })
+        if not values:
+            continue
+
+        stmt = pg_insert(Product).values(values)
+        image_url = func.coalesce(stmt.excluded.image_url, Product.image_url)
+        created = await db.scalars(
+            stmt.on_conflict_do_update(
+                index_elements=[Product.slug],
+                set_={
+                    "name": stmt.excluded.name,
+                    "description": stmt.excluded.description,
+                    "price": stmt.excluded.price,
+                    "category_id": stmt.excluded.category_id,
+                    "is_active": stmt.excluded.is_active,
+                    # onupdate не срабатывает в ON CONFLICT, задаём явно
+                    "updated_at": func.now(),
+                    "image_url": image_url,
+                    # Превью старой картинки к новой не подходят
+                    "image_variants": case(
+                        (image_url.is_distinct_from(Product.image_url), None),
+                        else_=Product.image_variants,
+                    ),
+                },
+            )
+            # xmax = 0 только у только что вставленных строк
+            .returning(literal_column("xmax = 0"))
         )
+        created = created.all()
+        inserted += sum(created)
+        updated += len(created) - sum(created)
+
+    if inserted or updated:
+        await catalog_cache.bump(db)
+    await db.commit()
+    if inserted or updated:
+        await catalog_cache.refresh(db)
+    errors.sort(key=lambda error: error["row"])
+    return {
+        "status_code": status.HTTP_200_OK,
+        "rows": rows_total,
+        "inserted": inserted,
+        "updated": updated,
+        "failed": len(errors),
+        "errors": errors[:MAX_REPORTED_ERRORS],
+    }
 
-    subcategories = await db.scalars(
-        select(Category).where(Category.parent_id == category.id)
+
+@router.get("/export")
+async def export_products(
+    get_user: Annotated[dict, Depends(get_current_user)],
+    format: Literal["csv", "ndjson"] = "csv",
+    include_inactive: bool = False,
+):
+    """Выгрузка товаров потоком, в формате, который принимает /products/import."""
+    if not get_user.get("is_admin"):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="You are not authorized to use this method",
+        )
+
+    query = select(
+        Product.id, Product.name, Product.slug, Product.description, Product.price,
+        Product.category_id.label("category"), Product.image_url, Product.rating,
+        Product.is_active,
+    ).order_by(Product.id)
+    if not include_inactive:
+        query = query.where(Product.is_active == True)
+
+    if format == "csv":
+        body, media_type = stream_csv(query), "text/csv; charset=utf-8"
+    else:
+        body, media_type = stream_ndjson(query), "application/x-ndjson"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="products.{format}"'},
+    )
+
+
+def feed_query(updated_since: datetime | None = None):
+    query = select(*Product.__table__.columns).order_by(Product.updated_at, Product.id)
+    if updated_since is None:
+        return query.where(Product.is_active == True)
+    # Нестрогое сравнение: строки с тем же updated_at не теряются,
+    # ценой повтора на границе
+    return query.where(
+        Product.updated_at >= updated_since,
+        Product.updated_at < func.now() - timedelta(seconds=FEED_SAFETY_LAG),
     )
-    categories_and_subcategories = [
-        category.id] + [i.id for i in subcategories.all()]
-    products = await db.scalars(
-        select(Product).where(
-            Product.category_id.in_(categories_and_subcategories),
+
+
+@router.get("/feed")
+async def product_feed(updated_since: datetime | None = None):
+    """Весь каталог потоком NDJSON, по строке на товар, в порядке (updated_at, id).
+
+    С updated_since отдаются только изменённые с этого момента товары, включая
+    снятые с продажи, чтобы потребитель мог их удалить у себя. Следующий
+    запрос клиент делает с наибольшим полученным updated_at.
+
+    updated_at — время начала транзакции записи, а не её commit: долгий импорт
+    фиксирует строки со временем раньше уже отданных. Поэтому инкрементальная
+    лента не отдаёт строки моложе FEED_SAFETY_LAG секунд, они придут следующим
+    запросом; задержка должна быть больше самой долгой записи в каталог и
+    отставания реплики. Полная выгрузка отдаёт все активные товары, и после неё
+    продолжать стоит с момента на FEED_SAFETY_LAG раньше её начала.
+    """
+    return StreamingResponse(stream_ndjson(feed_query(updated_since)), media_type="application/x-ndjson")
+
+
+@router.get(
+    "/search",
+    response_model=ProductSearchPage,
+    dependencies=[Depends(catalog_conditional_get)],
+)
+async def search_products(
+    db: Annotated[AsyncSession, Depends(get_db)],
+    q: Annotated[str, Query(min_length=2, max_length=100)],
+    limit: Annotated[int, Query(ge=1, le=100)] = 20,
+    cursor: str | None = None,
+):
+    offset = 0
+    if cursor is not None:
+        position = decode_cursor(cursor)
+        if (
+            len(position) != 2 or position[0] != q
+            or not _is_int4(position[1]) or position[1] < 0
+        ):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Cursor does not match search query",
+            )
+        offset = position[1]
+
+    # Транслитерация запроса сравнивается со slug товара, поэтому
+    # "пеперони" находит "pepperoni" и наоборот
+    transliterated = slugify(q, separator=" ")
+    tsquery = func.websearch_to_tsquery(literal_column("'simple'"), q)
+    rank = func.greatest(
+        func.ts_rank(search_document, tsquery),
+        func.similarity(Product.name, q),
+        func.similarity(Product.slug, transliterated),
+    ).label("rank")
+
+    # Каждое условие OR обслуживается своим GIN-индексом (BitmapOr)
+    rows = await db.execute(
+        select(*Product.__table__.columns, rank)
+        .where(
             Product.is_active == True,
+            or_(
+                search_document.op("@@")(tsquery),
+                Product.name.op("%")(q),
+                Product.slug.op("%")(transliterated),
+            ),
         )
+        .order_by(rank.desc(), Product.id)
+        .offset(offset)
+        .limit(limit + 1)
     )
-    return products.all()
+    items = [dict(row) for row in rows.mappings()]
 
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_cursor([q, offset + limit])
+    return {"items": items, "next_cursor": next_cursor}
 
-@router.get("/detail/{product_slug}")
+
+@router.get(
+    "/{category_slug}",
+    response_model=list[ProductOut],
+    dependencies=[Depends(catalog_conditional_get)],
+)
+async def product_by_category(
+    db: Annotated[AsyncSession, Depends(get_db)], category_slug: str
+):
+    # Товары всего поддерева категории (любой глубины) одним запросом
+    # по индексу categories.path
+    root = aliased(Category)
+    products = await db.execute(
+        select(*Product.__table__.columns)
+        .join(Category, Product.category_id == Category.id)
+        .join(root, in_subtree(root.path))
+        .where(root.slug == category_slug, Product.is_active == True)
+    )
+    products = products.mappings().all()
+    if not products and await db.scalar(
+        select(Category.id).where(Category.slug == category_slug)
+    ) is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Category not found"
+        )
+    return products
+
+
+@router.get(
+    "/detail/{product_slug}",
+    response_model=ProductOut,
+    dependencies=[Depends(catalog_conditional_get)],
+)
 async def product_detail(
     db: Annotated[AsyncSession, Depends(get_db)], product_slug: str
 ):
-    product = await db.scalar(select(Product).where(Product.slug == product_slug))
+    product = await db.execute(
+        select(*Product.__table__.columns).where(Product.slug == product_slug)
+    )
+    product = product.mappings().first()
     if product is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Product not found"
@@ -136,28 +511,27 @@ async def update_product(
             detail="You are not authorized to use this method",
         )
 
-    new_image_url = product_update.image_url
+    values = {
+        "name": name,
+        "description": description,
+        "price": price,
+        "category_id": category,
+        "slug": slugify(name),
+    }
+    # Картинку и превью трогаем только при новой загрузке: иначе записали бы
+    # поверх прочитанные в начале запроса, затерев превью, которые фоновая
+    # задача schedule_variants успела сохранить за это время
     if file:
-        unique_filename = f"{uuid.uuid4()}-{file.filename}"
-        file_location = Path(UPLOAD_FOLDER) / unique_filename
-        file_location.parent.mkdir(parents=True, exist_ok=True)
-        with file_location.open("wb") as f:
-            shutil.copyfileobj(file.file, f)
-        new_image_url = f"/static/{unique_filename}"
+        file_location = await store_upload(file)
+        new_image_url = f"/static/{file_location.name}"
+        values.update(image_url=new_image_url, image_variants=None)
 
-    await db.execute(
-        update(Product)
-        .where(Product.slug == product_slug)
-        .values(
-            name=name,
-            description=description,
-            price=price,
-            image_url=new_image_url,
-            category_id=category,
-            slug=slugify(name),
-        )
-    )
+    await db.execute(update(Product).where(Product.slug == product_slug).values(**values))
+    await catalog_cache.bump(db)
     await db.commit()
+    await catalog_cache.refresh(db)
+    if file:
+        schedule_variants(product_update.id, new_image_url, file_location)
     return {"status_code": status.HTTP_200_OK, "transaction": "Product update is successful"}
 
 
@@ -182,5 +556,7 @@ async def delete_product(
     await db.execute(
         update(Product).where(Product.id == product_id).values(is_active=False)
     )
+    await catalog_cache.bump(db)
     await db.commit()
+    await catalog_cache.refresh(db)
     return {"status_code": status.HTTP_200_OK, "transaction": "Product delete is successful"}
@@ -1,4 +1,6 @@
-from pydantic import BaseModel
+from datetime import datetime
+
+from pydantic import BaseModel, Field
 
 
 class CreateProduct(BaseModel):
@@ -14,6 +16,77 @@ class CreateCategory(BaseModel):
 
 
 class CreateCart(BaseModel):
-    product_id: int
+    product_id: int = Field(ge=1, le=2**31 - 1)
     radius: float
     quantity: str
+
+
+class CartOperation(BaseModel):
+    # Границы int4: значения за ними asyncpg не отправит, и запрос упадёт с 500
+    product_id: int = Field(ge=1, le=2**31 - 1)
+    radius: float
+    delta: int = Field(ge=-1000, le=1000)
+
+
+class BatchCart(BaseModel):
+    operations: list[CartOperation] = Field(min_length=1, max_length=100)
+
+
+# Схемы ответов. Заполняются из строк Core-запросов (dict), а не из ORM-объектов,
+# поэтому сериализация не вызывает ленивых загрузок
+class ProductOut(BaseModel):
+    # Nullability совпадает со столбцами: старые строки могут содержать NULL
+    id: int
+    name: str | None
+    slug: str | None
+    description: str | None
+    price: int | None
+    image_url: str | None
+    image_variants: dict | None
+    category_id: int | None
+    rating: float | None
+    is_active: bool | None
+    updated_at: datetime
+
+
+class ProductPage(BaseModel):
+    items: list[ProductOut]
+    next_cursor: str | None
+
+
+class ProductSearchHit(ProductOut):
+    rank: float
+
+
+class ProductSearchPage(BaseModel):
+    items: list[ProductSearchHit]
+    next_cursor: str | None
+
+
+class CategoryOut(BaseModel):
+    id: int
+    name: str | None
+    slug: str | None
+    is_active: bool | None
+    parent_id: int | None
+    path: str | None
+    updated_at: datetime
+
+
+class CartLine(BaseModel):
+    product_id: int
+    product_name: str | None
+    product_price: int | None
+    radius: float | None
+    quantity: int | None
+    total_price: int | None
+    image_url: str | None
+
+
+class CartOut(BaseModel):
+    status_code: int
+    cart: list[CartLine]
+
+
+class BatchCartOut(CartOut):
+    total_price: int
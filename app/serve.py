@@ -0,0 +1,52 @@
+"""Запуск в продакшене: несколько процессов uvicorn без reload.
+
+    python -m app.serve
+
+Число воркеров — WEB_CONCURRENCY, по умолчанию по числу доступных процессу
+CPU. Каждый воркер держит свой пул соединений (DB_POOL_SIZE + DB_MAX_OVERFLOW),
+это нужно учитывать в max_connections Postgres.
+
+/metrics складывает метрики всех воркеров через новый подкаталог METRICS_DIR
+(без него — через временный каталог); подкаталоги прошлых запусков можно
+удалять. X-Forwarded-* принимаются только от адресов из FORWARDED_ALLOW_IPS
+(переменная uvicorn, по умолчанию 127.0.0.1).
+"""
+import os
+import tempfile
+
+import uvicorn
+
+from app.backend.config import HOST, METRICS_DIR, PORT, WEB_CONCURRENCY
+
+
+def worker_count() -> int:
+    if WEB_CONCURRENCY > 0:
+        return WEB_CONCURRENCY
+    # Учитывает ограничение CPU через affinity (cpuset контейнера)
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def metrics_dir() -> str:
+    # Каждый запуск пишет в свой новый подкаталог: файлы прошлых запусков не
+    # попадают в сумму, а сам METRICS_DIR (его задаёт оператор) не чистится
+    if METRICS_DIR:
+        os.makedirs(METRICS_DIR, exist_ok=True)
+    return tempfile.mkdtemp(prefix="pizza-metrics-", dir=METRICS_DIR)
+
+
+def main() -> None:
+    # Воркеры получают каталог через окружение и читают его в config
+    os.environ["METRICS_DIR"] = metrics_dir()
+    uvicorn.run(
+        "app.main:app",
+        host=HOST,
+        port=PORT,
+        workers=worker_count(),
+        proxy_headers=True,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""Микробенчмарк get_current_user: полная проверка JWT против кэша.
+
+    python -m benchmarks.auth_cache --calls 20000
+"""
+import argparse
+import asyncio
+import time
+
+from jose import jwt
+
+from app.routers.auth import ALGORITHM, SECRET_KEY, get_current_user, token_cache
+
+
+def make_token(user_id: int) -> str:
+    return jwt.encode(
+        {
+            "id": user_id,
+            "first_name": "Иван",
+            "last_name": "Петров",
+            "is_admin": False,
+            "exp": int(time.time()) + 3600,
+        },
+        SECRET_KEY,
+        algorithm=ALGORITHM,
+    )
+
+
+async def run(tokens: list[str], calls: int, cached: bool) -> float:
+    started = time.perf_counter()
+    for n in range(calls):
+        if not cached:
+            token_cache._entries.clear()
+        await get_current_user(tokens[n % len(tokens)])
+    return (time.perf_counter() - started) / calls * 1_000_000
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=20_000)
+    parser.add_argument("--users", type=int, default=100)
+    args = parser.parse_args()
+
+    tokens = [make_token(n) for n in range(args.users)]
+    uncached = await run(tokens, args.calls, cached=False)
+    cached = await run(tokens, args.calls, cached=True)
+    print(f"verify every call: {uncached:8.2f} us/call")
+    print(f"verified cache:    {cached:8.2f} us/call  ({uncached / cached:.1f}x)")
+    print(token_cache.stats())
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,118 @@
+"""Микробенчмарки CPU-горячих мест запроса с контролем регрессий.
+
+Каждый случай замеряется timeit (лучший из нескольких повторов, время на
+вызов) и сравнивается с сохранённым в benchmarks/baselines.json. Если случай
+медленнее базового больше чем на --threshold, скрипт завершается с кодом 1.
+Базовые значения зависят от машины: сохраняйте их на той же, где проверяете.
+
+    python -m benchmarks.micro                  # сравнить с baselines.json
+    python -m benchmarks.micro --save           # записать новые базовые значения
+    python -m benchmarks.micro -k slugify       # только случаи с подстрокой
+"""
+import argparse
+import json
+import sys
+import timeit
+from pathlib import Path
+
+from fastapi.encoders import jsonable_encoder
+from jose import jwt
+from slugify import slugify
+
+from app.backend.catalog_cache import PRODUCT_LIST
+from app.backend.notifications import build_order_email
+from app.models import Product
+from app.routers.auth import ALGORITHM, SECRET_KEY, token_cache
+from benchmarks.auth_cache import make_token
+from benchmarks.serialization import make_rows
+
+BASELINES = Path(__file__).with_name("baselines.json")
+PRODUCT_SIZES = (1, 100, 10_000)
+CART_SIZES = (1, 10, 50)
+
+
+def cart_lines(count: int) -> list[dict]:
+    return [
+        {
+            "product_id": n,
+            "product_name": f"Пицца {n}",
+            "product_price": 450,
+            "radius": 30.0,
+            "quantity": 2,
+            "total_price": 900,
+            "image_url": "/static/placeholder.jpg",
+        }
+        for n in range(count)
+    ]
+
+
+def cases() -> dict:
+    """Имя случая -> функция без аргументов."""
+    token = make_token(1)
+    token_cache.put(token, {"id": 1}, float("inf"))
+    result = {
+        "jwt.decode": lambda: jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]),
+        "jwt.cached": lambda: token_cache.get(token),
+    }
+    for size in PRODUCT_SIZES:
+        rows = make_rows(size)
+        names = [row["name"] for row in rows]
+        objects = [Product(**row) for row in rows]
+        result[f"slugify[{size}]"] = lambda names=names: [slugify(name) for name in names]
+        result[f"jsonable_encoder.orm[{size}]"] = lambda objects=objects: jsonable_encoder(objects)
+        result[f"product_list.dump_json[{size}]"] = (
+            lambda rows=rows: PRODUCT_LIST.dump_json(PRODUCT_LIST.validate_python(rows))
+        )
+    for size in CART_SIZES:
+        lines = cart_lines(size)
+        total = sum(line["total_price"] for line in lines)
+        result[f"build_order_email[{size}]"] = (
+            lambda lines=lines, total=total: build_order_email("Иван", lines, total)
+        )
+    return result
+
+
+def measure(fn, repeat: int) -> float:
+    """Лучшее время одного вызова, микросекунды."""
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number * 1_000_000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--save", action="store_true", help="записать baselines.json")
+    parser.add_argument("--threshold", type=float, default=0.25, help="допустимое замедление, доля")
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("-k", dest="keyword", default="")
+    args = parser.parse_args()
+
+    baselines = json.loads(BASELINES.read_text()) if BASELINES.exists() else {}
+    results = {}
+    regressions = []
+    for name, fn in cases().items():
+        if args.keyword not in name:
+            continue
+        results[name] = current = measure(fn, args.repeat)
+        baseline = baselines.get(name)
+        if baseline is None:
+            print(f"{name:<34} {current:12.2f} us   (no baseline)")
+            continue
+        change = current / baseline - 1
+        mark = ""
+        if change > args.threshold:
+            regressions.append(name)
+            mark = "  REGRESSION"
+        print(f"{name:<34} {current:12.2f} us   baseline {baseline:12.2f} us  {change:+7.1%}{mark}")
+
+    if args.save:
+        baselines.update({name: round(value, 3) for name, value in results.items()})
+        BASELINES.write_text(json.dumps(baselines, indent=2, sort_keys=True) + "\n")
+        print(f"baselines written to {BASELINES}")
+    elif regressions:
+        print(f"{len(regressions)} case(s) slower than baseline by more than {args.threshold:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
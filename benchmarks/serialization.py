@@ -0,0 +1,88 @@
+"""Стоимость сериализации списка товаров на 1k строк: как раньше и сейчас.
+
+- orm + jsonable_encoder: ORM-объекты без response_model, JSONResponse;
+- rows + response_model: строки Core, схема ProductOut, ORJSONResponse;
+- snapshot bytes: готовое тело из снимка каталога (сборка раз на ревизию).
+
+    python -m benchmarks.serialization --products 1000
+"""
+import argparse
+import asyncio
+import datetime
+import time
+
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+from app.backend.catalog_cache import PRODUCT_LIST
+from app.models import Product
+from app.schemas import ProductOut
+
+
+def make_rows(count: int) -> list[dict]:
+    now = datetime.datetime.now(datetime.timezone.utc)
+    return [
+        {
+            "id": n,
+            "name": f"Пицца {n}",
+            "slug": f"pizza-{n}",
+            "description": "моцарелла, томаты, базилик, пармезан",
+            "price": 300 + n % 1000,
+            "image_url": f"/static/{n:064x}.jpg",
+            "image_variants": {
+                "widths": [320, 640],
+                "srcset": {"image/webp": f"/static/{n}-320.webp 320w, /static/{n}-640.webp 640w"},
+                "placeholder": "data:image/webp;base64,UklGRh4AAABXRUJQVlA4",
+            },
+            "category_id": 1 + n % 10,
+            "rating": 4.5,
+            "is_active": True,
+            "updated_at": now,
+        }
+        for n in range(count)
+    ]
+
+
+async def measure(render, rounds: int) -> float:
+    started = time.perf_counter()
+    for _ in range(rounds):
+        await render()
+    return (time.perf_counter() - started) / rounds * 1000
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+
+    rows = make_rows(args.products)
+    objects = [Product(**row) for row in rows]
+    field = create_model_field(name="Response", type_=list[ProductOut], mode="serialization")
+
+    async def before():
+        content = await serialize_response(response_content=objects)
+        JSONResponse(content).body
+
+    async def after():
+        content = await serialize_response(field=field, response_content=rows)
+        ORJSONResponse(content).body
+
+    async def snapshot():
+        PRODUCT_LIST.dump_json(PRODUCT_LIST.validate_python(rows))
+
+    per_1k = 1000 / args.products
+    results = {
+        "orm + jsonable_encoder": await measure(before, args.rounds),
+        "rows + response_model": await measure(after, args.rounds),
+        "snapshot bytes (build)": await measure(snapshot, args.rounds),
+    }
+    baseline = results["orm + jsonable_encoder"]
+    for name, ms in results.items():
+        print(f"{name:<24} {ms * per_1k:8.2f} ms per 1k products  ({baseline / ms:.1f}x)")
+    print("snapshot bytes (request)     0.00 ms: тело отдаётся как есть")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,65 @@
+import pytest
+from sqlalchemy import insert
+
+from app.backend.sql_profiler import assert_max_queries
+from app.models import Cart, Category, Product
+from app.routers.cart import checkout_cart, get_cart
+
+pytestmark = pytest.mark.anyio
+
+CART_SIZES = (1, 12, 50)
+USER = {"id": 1, "first_name": "Иван", "email": "ivan@example.com"}
+
+
+async def fill_cart(db, size: int) -> None:
+    await db.execute(insert(Category).values(id=1, name="Пиццы", slug="pizza", is_active=True, path="/1/"))
+    await db.execute(
+        insert(Product),
+        [
+            {
+                "id": n,
+                "name": f"Пицца {n}",
+                "slug": f"pizza-{n}",
+                "price": 100 * n,
+                "image_url": f"/static/{n}.jpg",
+                "category_id": 1,
+                "is_active": True,
+            }
+            for n in range(1, size + 1)
+        ],
+    )
+    await db.execute(
+        insert(Cart),
+        [{"user_id": "1", "product_id": n, "radius": 30.0, "quantity": 2} for n in range(1, size + 1)],
+    )
+    await db.commit()
+
+
+@pytest.mark.parametrize("size", CART_SIZES)
+async def test_get_cart_is_one_query(sqlite_db, size):
+    await fill_cart(sqlite_db, size)
+
+    with assert_max_queries(1):
+        result = await get_cart(db=sqlite_db, get_user=USER)
+
+    assert len(result["cart"]) == size
+    assert result["cart"][-1] == {
+        "product_id": size,
+        "product_name": f"Пицца {size}",
+        "product_price": 100 * size,
+        "radius": 30.0,
+        "quantity": 2,
+        "total_price": 200 * size,
+        "image_url": f"/static/{size}.jpg",
+    }
+
+
+@pytest.mark.parametrize("size", CART_SIZES)
+async def test_checkout_query_count_does_not_depend_on_cart_size(postgres_db, size):
+    await fill_cart(postgres_db, size)
+
+    # Удаление строк корзины с товарами, заказ, его позиции, письмо в outbox
+    with assert_max_queries(4):
+        result = await checkout_cart(db=postgres_db, get_user=USER)
+
+    assert result["order_id"] is not None
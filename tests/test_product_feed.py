@@ -0,0 +1,56 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import insert
+
+from app.backend.config import FEED_SAFETY_LAG
+from app.models import Category, Product
+from app.routers.products import feed_query
+
+pytestmark = pytest.mark.anyio
+
+
+async def add_products(db, updated_at: datetime) -> None:
+    await db.execute(insert(Category).values(id=1, name="Пиццы", slug="pizza", is_active=True, path="/1/"))
+    await db.execute(
+        insert(Product),
+        [
+            {
+                "id": 1,
+                "name": "Маргарита",
+                "slug": "margarita",
+                "price": 500,
+                "category_id": 1,
+                "is_active": True,
+                "updated_at": updated_at - timedelta(days=1),
+            },
+            {
+                "id": 2,
+                "name": "Пепперони",
+                "slug": "pepperoni",
+                "price": 600,
+                "category_id": 1,
+                "is_active": True,
+                "updated_at": updated_at,
+            },
+        ],
+    )
+    await db.commit()
+
+
+async def test_full_feed_includes_just_updated_products(sqlite_db):
+    await add_products(sqlite_db, datetime.now(timezone.utc))
+
+    rows = await sqlite_db.execute(feed_query())
+
+    assert [row.id for row in rows] == [1, 2]
+
+
+async def test_incremental_feed_holds_back_just_updated_products(postgres_db):
+    now = datetime.now(timezone.utc)
+    await add_products(postgres_db, now)
+
+    rows = await postgres_db.execute(feed_query(now - timedelta(days=2)))
+
+    assert FEED_SAFETY_LAG > 0
+    assert [row.id for row in rows] == [1]